@@ -0,0 +1,283 @@
+import sys
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from environment import Agent, Environment
+from planner import RoutePlanner
+from qtable import STATES, ACTIONS, STATE_IDS, ACTION_IDS, ArrayQTable
+from agent import alpha_schedule
+from events import log
+
+# Counters at the start of a ring's shared block; head is written only by the actor and
+# tail only by the learner, so a ring needs no lock (8-byte stores are not torn on the
+# platforms we train on)
+HEAD, TAIL, DONE, TRIALS, SUCCESSES, DROPPED, STEPS = range(7)
+RING_COUNTERS = 8
+TABLE_COUNTERS = 2  # version (bumped after every learner update), transitions learned
+VERSION, LEARNED = range(TABLE_COUNTERS)
+
+
+class SharedBlock(object):
+    """Typed NumPy views laid out back to back in one shared memory block."""
+
+    def __init__(self, layout, shm=None):
+        """
+        Create a new shared block, or map an existing one.
+
+        Parameters:
+        layout (list): (name, dtype, shape) of each array, in order.
+        shm (SharedMemory): An existing block with this layout; a new one is created if None.
+        """
+        offsets = []
+        size = 0
+        for name, dtype, shape in layout:
+            size = -(-size // 8) * 8  # Keep every array 8-byte aligned
+            offsets.append(size)
+            size += np.dtype(dtype).itemsize * int(np.prod(shape))
+        self.shm = shm if shm is not None else shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for (name, dtype, shape), offset in zip(layout, offsets):
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+        self.names = [name for name, dtype, shape in layout]
+
+    def close(self):
+        """Drop the views and unmap the block."""
+        for name in self.names:
+            setattr(self, name, None)
+        self.shm.close()
+
+
+def table_layout():
+    return [('counters', np.int64, TABLE_COUNTERS), ('q', np.float64, (len(STATES), len(ACTIONS)))]
+
+
+def ring_layout(capacity):
+    return [('counters', np.int64, RING_COUNTERS), ('states', np.int16, capacity), ('actions', np.int8, capacity),
+            ('rewards', np.float32, capacity), ('next_states', np.int16, capacity)]
+
+
+class TransitionRing(SharedBlock):
+    """Single-producer, single-consumer ring of transitions in shared memory, from one actor to the learner."""
+
+    def __init__(self, capacity, shm=None):
+        super(TransitionRing, self).__init__(ring_layout(capacity), shm)
+        self.capacity = capacity
+
+    def push(self, state, action, reward, next_state):
+        """Append a transition, or count it as dropped if the learner has fallen a full ring behind."""
+        counters = self.counters
+        head = int(counters[HEAD])
+        if head - int(counters[TAIL]) >= self.capacity:
+            counters[DROPPED] += 1
+            return
+        i = head % self.capacity
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        counters[HEAD] = head + 1  # Publish only after the slot is written
+
+    def pop_all(self):
+        """
+        Take every transition published so far.
+
+        Returns:
+        tuple: (states, actions, rewards, next_states) arrays, possibly empty.
+        """
+        counters = self.counters
+        tail = int(counters[TAIL])
+        head = int(counters[HEAD])
+        i = np.arange(tail, head) % self.capacity
+        batch = self.states[i], self.actions[i], self.rewards[i], self.next_states[i]
+        counters[TAIL] = head
+        return batch
+
+
+class ActorAgent(Agent):
+    """An agent that acts greedily on the learner's shared Q-table and sends its transitions to the learner."""
+
+    def __init__(self, env, table, ring):
+        """
+        Initialize an ActorAgent.
+
+        Parameters:
+        env (Environment): The environment instance the agent interacts with.
+        table (SharedBlock): The learner's Q-table, read through a zero-copy view.
+        ring (TransitionRing): Where to send transitions.
+        """
+        super(ActorAgent, self).__init__(env)
+        self.color = 'red'
+        self.planner = RoutePlanner(self.env, self)
+        self.table = table
+        self.qs = ArrayQTable(rng=env.random)
+        self.qs.q = table.q  # Shared, not copied; greedy actions are cached per table version
+        self.version = -1
+        self.ring = ring
+        self.last_transition = None
+
+    def reset(self, destination=None):
+        """Route to the new destination and pick up the learner's latest Q-values."""
+        self.planner.route_to(destination)
+        self.last_transition = None
+        self.sync()
+
+    def sync(self):
+        """Forget cached greedy actions if the learner has updated the table since they were computed."""
+        version = int(self.table.counters[VERSION])
+        if version != self.version:
+            self.version = version
+            self.qs.invalidate()
+
+    def update(self, t):
+        """
+        Sense the environment, act greedily and send the transition to the learner.
+
+        Parameters:
+        t (int): The current time step.
+        """
+        self.next_waypoint = self.planner.next_waypoint()
+        inputs = self.env.sense(self)
+        self.state = (inputs['light'], inputs['oncoming'], inputs['left'], self.next_waypoint)
+        state_id = STATE_IDS[self.state]
+        if self.last_transition is not None:
+            self.ring.push(*(self.last_transition + (state_id,)))
+        action, value = self.qs.best_action(self.state)
+        reward = self.env.act(self, action)
+        self.last_transition = (state_id, ACTION_IDS[action], reward)
+
+
+def run_actor(table_shm, ring_shm, ring_size, n_trials, seed, sync_every, grid_size, num_dummies):
+    """Run one actor process: n_trials of its own headless environment."""
+    log.set_level('WARNING')
+    table = SharedBlock(table_layout(), table_shm)
+    ring = TransitionRing(ring_size, ring_shm)
+    agent = None
+    try:
+        env = Environment(grid_size=grid_size, num_dummies=num_dummies, seed=seed)
+        agent = env.create_agent(ActorAgent, table, ring)
+        env.set_primary_agent(agent, enforce_deadline=True)
+        for trial in range(n_trials):
+            env.reset(trial=trial)
+            steps = 0
+            while not env.done:
+                env.step()
+                steps += 1
+                if steps % sync_every == 0:
+                    agent.sync()
+            ring.counters[TRIALS] += 1
+            ring.counters[SUCCESSES] += env.success
+            ring.counters[STEPS] += steps
+    finally:
+        ring.counters[DONE] = 1
+        if agent is not None:
+            agent.qs.q = None  # Release the view so the block can be unmapped
+        table.close()
+        ring.close()
+
+
+def train(n_actors=None, trials_per_actor=100, gamma=0.5, alpha='inverse', ring_size=1 << 16, sync_every=16,
+          grid_size=(8, 6), num_dummies=3, seed=0, poll_interval=0.001):
+    """
+    Train a Q-table with actor processes feeding a learner through shared memory.
+
+    The calling process is the learner: it owns the Q-table, drains every actor's ring of
+    transitions and applies them as batched Q-learning updates. Actors read the table
+    through a zero-copy view and refresh their cached greedy actions every sync_every steps.
+
+    Parameters:
+    n_actors (int): Number of actor processes (one per core if None).
+    trials_per_actor (int): Trials each actor runs.
+    gamma (float): Discount factor.
+    alpha (str, float or callable): Learning rate schedule over transitions learned (see agent.alpha_schedule).
+    ring_size (int): Transitions each ring holds; an actor drops transitions while its ring is full.
+    sync_every (int): Steps between an actor's checks for a newer table.
+    grid_size (tuple): Grid size as (cols, rows).
+    num_dummies (int): Number of dummy agents per environment.
+    seed (int): Seed of actor 0; actor k uses seed + k.
+    poll_interval (float): Seconds the learner sleeps when no transitions are waiting.
+
+    Returns:
+    tuple: (learned ArrayQTable, statistics dict).
+    """
+    n_actors = n_actors or multiprocessing.cpu_count()
+    alpha = alpha_schedule(alpha)
+    table = SharedBlock(table_layout())
+    table.counters[:] = 0
+    table.q[:] = 0
+    rings = [TransitionRing(ring_size) for _ in range(n_actors)]
+    for ring in rings:
+        ring.counters[:] = 0
+    learner = ArrayQTable()
+    learner.q = table.q
+
+    start = time.perf_counter()
+    actors = [multiprocessing.Process(target=run_actor, args=(table.shm, ring.shm, ring_size, trials_per_actor, seed + k, sync_every, grid_size, num_dummies))
+              for k, ring in enumerate(rings)]
+    try:
+        for actor in actors:
+            actor.start()
+        learned = 0
+        while True:
+            # Read before draining, so nothing published is missed; an actor that died counts as done
+            done = all(ring.counters[DONE] or not actor.is_alive() for ring, actor in zip(rings, actors))
+            batches = [ring.pop_all() for ring in rings]
+            n = sum(len(batch[0]) for batch in batches)
+            if n:
+                states, actions, rewards, next_states = (np.concatenate(parts) for parts in zip(*batches))
+                learned += n
+                targets = rewards + gamma * table.q[next_states].max(axis=1)
+                learner.update_batch(states, actions, targets, alpha(learned))
+                table.counters[LEARNED] = learned
+                table.counters[VERSION] += 1
+            elif done:
+                break
+            else:
+                time.sleep(poll_interval)
+        for actor in actors:
+            actor.join()
+        elapsed = time.perf_counter() - start
+
+        learner.q = table.q.copy()
+        stats = {
+            'actors': n_actors,
+            'trials': int(sum(ring.counters[TRIALS] for ring in rings)),
+            'successes': int(sum(ring.counters[SUCCESSES] for ring in rings)),
+            'steps': int(sum(ring.counters[STEPS] for ring in rings)),
+            'transitions': learned,
+            'dropped': int(sum(ring.counters[DROPPED] for ring in rings)),
+            'updates': int(table.counters[VERSION]),
+            'elapsed': elapsed,
+            'steps_per_sec': sum(int(ring.counters[STEPS]) for ring in rings) / elapsed if elapsed > 0 else float('inf')}
+    finally:
+        for actor in actors:
+            if actor.is_alive():
+                actor.terminate()
+        if learner.q is table.q:
+            learner.q = None
+        for block in [table] + rings:
+            block.close()
+            block.shm.unlink()
+    return learner, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a Q-table with parallel actors and one learner sharing memory.")
+    parser.add_argument('--actors', type=int, default=None, help="actor processes (default: one per core)")
+    parser.add_argument('--trials', type=int, default=100, help="trials per actor")
+    parser.add_argument('--gamma', type=float, default=0.5, help="discount factor")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first actor")
+    parser.add_argument('--output', help="save the learned Q-table as a checkpoint (see checkpoint.py)")
+    args = parser.parse_args(argv)
+
+    table, stats = train(args.actors, args.trials, args.gamma, seed=args.seed)
+    print(', '.join('{} = {}'.format(key, value) for key, value in stats.items()))
+    if args.output:
+        from checkpoint import write_checkpoint
+        write_checkpoint(args.output, table.q, table.visits, stats['transitions'], args.gamma)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,29 +1,94 @@
-import random
 from environment import Agent, Environment
 from planner import RoutePlanner
 from simulator import Simulator
-import pandas as pd
-import re
+from qtable import qtable_backends, ArrayQTable, STATE_IDS, ACTION_IDS
+from events import log
+import numpy as np
+
+def inverse_alpha(time):
+    """Learning rate 1/t, which decays with the number of steps taken."""
+    return 1.0 / time
+
+
+def inverse_sqrt_alpha(time):
+    """Learning rate 1/sqrt(t), which decays more slowly than 1/t."""
+    return time ** -0.5
+
+
+alpha_schedules = {'inverse': inverse_alpha, 'inverse_sqrt': inverse_sqrt_alpha}
+
+
+class ConstantAlpha(object):
+    """Learning rate that does not change over time (a class rather than a closure so it can be pickled)."""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+
+    def __call__(self, time):
+        return self.alpha
+
+
+def alpha_schedule(spec):
+    """
+    Get a learning rate schedule.
+
+    Parameters:
+    spec (str, float or callable): A name in alpha_schedules, a constant learning rate, or a function of the time step.
+
+    Returns:
+    callable: A function mapping the agent's time step (from 1) to a learning rate.
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, str):
+        if spec in alpha_schedules:
+            return alpha_schedules[spec]
+        spec = float(spec)
+    return ConstantAlpha(float(spec))
+
 
 class LearningAgent(Agent):
     """An agent that learns to drive in the smartcab world."""
 
-    def __init__(self, env):
+    def __init__(self, env, qtable='array', gamma=0.5, alpha='inverse', replay_size=0, replay_ratio=1.0, replay_batch=32, replay_eviction='fifo'):
         """
         Initialize a LearningAgent.
 
         Parameters:
         env (Environment): The environment instance the agent interacts with.
+        qtable (str): Q-table backend, 'array' (dense NumPy array) or 'dict' (keyed by (state, action)).
+        gamma (float): Discount factor for future rewards.
+        alpha (str, float or callable): Learning rate schedule (see alpha_schedule); 1/t by default.
+        replay_size (int): Capacity of an experience replay buffer (see replay.py); 0 disables replay.
+        replay_ratio (float): Replayed transitions per real step.
+        replay_batch (int): Transitions per batched replay update.
+        replay_eviction (str): Which transition a full buffer overwrites, 'fifo' or 'random'.
         """
         super(LearningAgent, self).__init__(env)  # Initialize the parent class (Agent)
         self.color = 'red'  # Override the agent color
         self.planner = RoutePlanner(self.env, self)  # Create a route planner for navigation
-        self.qs = {}  # Initialize Q-table for storing Q-values
+        self.possible_actions = (None, 'left', 'forward', 'right')  # Define possible actions
+        self.qs = qtable_backends[qtable](rng=env.random)  # Initialize Q-table for storing Q-values (ties broken with the environment's RNG)
+        self.gamma = gamma  # Discount factor for future rewards
+        self.alpha = alpha_schedule(alpha)  # Learning rate as a function of the time step
         self.time = 0  # Initialize time step counter
         self.errors = 0  # Initialize error counter
-        self.possible_actions = (None, 'left', 'forward', 'right')  # Define possible actions
+        self.total_reward = 0  # Initialize reward counter
         self.optimal_val = 0  # Initialize optimal Q-value
 
+        # Optional experience replay: transitions are completed with the next state observed
+        self.replay = None
+        self.last_transition = None  # (state id, action id, reward) waiting for its next state, if the trial went on
+        if replay_size:
+            if not isinstance(self.qs, ArrayQTable):
+                raise ValueError("Experience replay needs the 'array' Q-table backend")
+            from replay import ReplayBuffer
+            rng = np.random.default_rng(env.random.getrandbits(64))
+            self.replay = ReplayBuffer(replay_size, replay_eviction, rng)
+            self.replay_ratio = replay_ratio
+            self.replay_batch = replay_batch
+            self.replay_credit = 0.0  # Replayed transitions owed by the steps taken so far
+
     def reset(self, destination=None):
         """
         Reset the agent for a new trial.
@@ -32,6 +97,7 @@ class LearningAgent(Agent):
         destination (tuple): The destination to route to.
         """
         self.planner.route_to(destination)  # Route to the specified destination
+        self.last_transition = None  # The next trial does not continue the last one
         # TODO: Prepare for a new trip; reset any variables here, if required
         # Currently, no additional variables to reset
 
@@ -45,15 +111,9 @@ class LearningAgent(Agent):
         Returns:
         action (str): The best action for the given state.
         """
-        # Get all possible Q-values for the state
-        all_qs = {action: self.qs.get((state, action), 0) for action in self.possible_actions}
-
-        # Identify the actions that yield the highest Q-value
-        optimal_actions = [action for action in self.possible_actions if all_qs[action] == max(all_qs.values())]
-        self.optimal_val = float(max(all_qs.values()))  # Update the optimal Q-value
-
-        # Randomly select one of the best actions in case of a tie
-        return random.choice(optimal_actions)
+        # Pick one of the actions with the highest Q-value, at random in case of a tie
+        action, self.optimal_val = self.qs.best_action(state)
+        return action
 
     def update(self, t):
         """
@@ -69,8 +129,7 @@ class LearningAgent(Agent):
 
         # Increment time step counter and adjust learning rate
         self.time += 1
-        alpha = 1.0 / self.time  # Learning rate that decreases over time
-        gamma = 0.5  # Discount factor for future rewards
+        alpha = self.alpha(self.time)  # Learning rate, by default decreasing over time
 
         # Define the current state based on sensory inputs and the next waypoint
         self.state = (inputs['light'], inputs['oncoming'], inputs['left'], self.next_waypoint)
@@ -81,18 +140,50 @@ class LearningAgent(Agent):
         # Execute the action and get the reward from the environment
         reward = self.env.act(self, action)
 
-        # Record errors if the reward is negative
+        # Record the reward, and errors if the reward is negative
+        self.total_reward += reward
         if reward < 0:
             self.errors += reward
 
         # Update the Q-value of the (state, action) pair using the Q-learning formula
-        self.qs[(self.state, action)] = (1 - alpha) * self.qs.get((self.state, action), 0) \
-                                        + alpha * (reward + gamma * self.optimal_val)
+        self.qs.update(self.state, action, reward + self.gamma * self.optimal_val, alpha)
+
+        # Store the transition and learn from a batch of past ones when enough steps were taken
+        if self.replay is not None:
+            self.remember(STATE_IDS[self.state], ACTION_IDS[action], reward, alpha, done=self.env.success)
+
+        # Debug events to observe the agent's behavior
+        if log.debug_enabled:
+            log.debug('LearningAgent.update', "Reward is\n{}", reward)
+            log.debug('LearningAgent.update', "LearningAgent.update(): deadline = {}, inputs = {}, action = {}, reward = {}", deadline, inputs, action, reward)
+
+    def remember(self, state_id, action_id, reward, alpha, done=False):
+        """
+        Complete the previous transition with the current state, then replay if one is due.
+
+        Parameters:
+        state_id (int): The current state.
+        action_id (int): The action just taken.
+        reward (float): The reward just received.
+        alpha (float): The current learning rate.
+        done (bool): Whether the action reached the destination; the transition is then stored
+            right away as terminal, since no next state will follow it.
+        """
+        if self.last_transition is not None:
+            self.replay.add(*(self.last_transition + (state_id,)))
+        if done:
+            self.replay.add(state_id, action_id, reward, state_id, True)
+            self.last_transition = None
+        else:
+            self.last_transition = (state_id, action_id, reward)
+
+        self.replay_credit += self.replay_ratio
+        if self.replay_credit >= self.replay_batch and len(self.replay):
+            self.replay_credit -= self.replay_batch
+            states, actions, rewards, next_states, dones = self.replay.sample(self.replay_batch)
+            targets = rewards + np.where(dones, 0.0, self.gamma * self.qs.q[next_states].max(axis=1))
+            self.qs.update_batch(states, actions, targets, alpha)
 
-        # Debug print statements to observe the agent's behavior
-        print("Reward is")
-        print(reward)
-        print("LearningAgent.update(): deadline = {}, inputs = {}, action = {}, reward = {}".format(deadline, inputs, action, reward))
 
 def run():
     """Run the agent for a finite number of trials."""
@@ -0,0 +1,208 @@
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import itertools
+
+import numpy as np
+
+from environment import Environment
+from simulator import Simulator
+from agent import LearningAgent
+from qtable import STATES
+from events import log
+
+DEFAULT_GRIDS = ((8, 6), (32, 24))
+DEFAULT_DUMMIES = (3, 50)
+DEFAULT_THRESHOLD = 0.2  # Slow-down, as a fraction of the baseline time, that counts as a regression
+
+
+def measure(fn, repeat=5, min_time=0.05):
+    """
+    Time a function the way timeit does, with the garbage collector off.
+
+    Parameters:
+    fn (callable): Function of no arguments to time.
+    repeat (int): Number of timed batches; the fastest one is kept.
+    min_time (float): Seconds a batch should take at least; the number of calls per batch is doubled until it does.
+
+    Returns:
+    dict: 'seconds' per call (best batch) and 'calls' per batch.
+    """
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = min([elapsed] + timer.repeat(repeat - 1, number))
+    return {'seconds': best / number, 'calls': number}
+
+
+def make_environment(grid_size, num_dummies, seed=0):
+    """Set up a seeded environment with dummy traffic and a LearningAgent as the primary agent, reset for trial 0."""
+    env = Environment(grid_size=grid_size, num_dummies=num_dummies, seed=seed)
+    agent = env.create_agent(LearningAgent)
+    env.set_primary_agent(agent, enforce_deadline=False)
+    env.reset(trial=0)
+    return env, agent
+
+
+def micro_benchmarks(env, agent):
+    """
+    Get the hot-path functions of one environment to time.
+
+    Returns:
+    dict: Benchmark name -> function of no arguments.
+    """
+    actions = itertools.cycle(Environment.valid_actions)
+    states = itertools.cycle(STATES)
+    t = itertools.count()
+
+    def step():
+        env.step()
+        if env.done:  # The hard time limit ends even an undeadlined trial; start the next one
+            env.reset()
+
+    def sense():
+        env.obs_cache.clear()  # Time a cache miss, what the first sense of each agent in a step costs
+        env.sense(agent)
+
+    return {
+        'Environment.step': step,
+        'Environment.sense': sense,
+        'Environment.act': lambda: env.act(agent, next(actions)),
+        'RoutePlanner.next_waypoint': agent.planner.next_waypoint,
+        'LearningAgent.best_action': lambda: agent.best_action(next(states)),
+        'LearningAgent.update': lambda: agent.update(next(t))}
+
+
+def run_trials(grid_size, num_dummies, n_trials, seed=0):
+    """
+    Run headless trials of a fresh LearningAgent.
+
+    Returns:
+    dict: 'seconds' per step, 'steps' and 'trials' run.
+    """
+    env = Environment(grid_size=grid_size, num_dummies=num_dummies, seed=seed)
+    agent = env.create_agent(LearningAgent)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    stats = Simulator(env, update_delay=0, display=False).run_headless(n_trials)
+    return {'seconds': stats['elapsed'] / max(stats['steps'], 1), 'steps': stats['steps'], 'trials': stats['trials']}
+
+
+def run_benchmarks(grids=DEFAULT_GRIDS, dummies=DEFAULT_DUMMIES, n_trials=100, repeat=5, min_time=0.05, only=None):
+    """
+    Run the micro benchmarks and headless trials for every grid size and number of dummy agents.
+
+    Parameters:
+    grids (list): Grid sizes as (cols, rows).
+    dummies (list): Numbers of dummy agents.
+    n_trials (int): Headless trials per macro benchmark run.
+    repeat (int): Timed repetitions of each benchmark; the fastest is kept.
+    min_time (float): Seconds each micro benchmark batch takes at least.
+    only (str): Only run benchmarks whose name contains this.
+
+    Returns:
+    dict: Benchmark name -> result with 'seconds' per call (per step for headless trials).
+    """
+    results = {}
+    for grid_size, num_dummies in itertools.product(grids, dummies):
+        suffix = '[{}x{}, {} dummies]'.format(grid_size[0], grid_size[1], num_dummies)
+        env, agent = make_environment(grid_size, num_dummies)
+        for name, fn in micro_benchmarks(env, agent).items():
+            if only is None or only in name + suffix:
+                results[name + suffix] = measure(fn, repeat, min_time)
+        name = 'Simulator.run_headless' + suffix
+        if only is None or only in name:
+            runs = [run_trials(grid_size, num_dummies, n_trials) for _ in range(repeat)]
+            results[name] = min(runs, key=lambda run: run['seconds'])
+    return results
+
+
+def environment_info():
+    """Describe the machine and versions the benchmarks ran on."""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare benchmark results against a baseline.
+
+    Parameters:
+    results (dict): Benchmark name -> result, as returned by run_benchmarks.
+    baseline (dict): Results of an earlier run.
+    threshold (float): Relative slow-down that counts as a regression.
+
+    Returns:
+    list: (name, baseline seconds, current seconds, relative change, regressed) for each
+        benchmark in both, in the order of results.
+    """
+    rows = []
+    for name, result in results.items():
+        if name in baseline:
+            before, after = baseline[name]['seconds'], result['seconds']
+            change = after / before - 1.0 if before > 0 else 0.0
+            rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+def print_results(results, rows=None, stream=None):
+    """Print benchmark results, with the comparison to a baseline if there is one."""
+    stream = stream or sys.stdout
+    width = max(len(name) for name in results) if results else 0
+    if rows is None:
+        for name, result in results.items():
+            stream.write('{}  {:10.2f} us\n'.format(name.ljust(width), result['seconds'] * 1e6))
+        return
+    for name, before, after, change, regressed in rows:
+        stream.write('{}  {:10.2f} us  {:10.2f} us  {:+7.1%}{}\n'.format(name.ljust(width), before * 1e6, after * 1e6, change, '  REGRESSION' if regressed else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the environment, planner and agent hot paths, and compare against a baseline.")
+    parser.add_argument('--grids', nargs='+', default=['{}x{}'.format(*g) for g in DEFAULT_GRIDS], help="grid sizes as COLSxROWS")
+    parser.add_argument('--dummies', nargs='+', type=int, default=list(DEFAULT_DUMMIES), help="numbers of dummy agents")
+    parser.add_argument('--trials', type=int, default=100, help="trials per headless run")
+    parser.add_argument('--repeat', type=int, default=5, help="timed repetitions of each benchmark (the fastest is kept)")
+    parser.add_argument('--min-time', type=float, default=0.05, help="seconds each micro benchmark batch takes at least")
+    parser.add_argument('--only', help="only run benchmarks whose name contains this")
+    parser.add_argument('--output', help="write the results to this JSON file (e.g. to save a baseline)")
+    parser.add_argument('--baseline', help="compare against the results in this JSON file; exit with status 1 on a regression")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="relative slow-down that counts as a regression")
+    args = parser.parse_args(argv)
+
+    try:
+        grids = [tuple(int(n) for n in grid.lower().split('x')) for grid in args.grids]
+    except ValueError:
+        parser.error("grid sizes must look like 8x6")
+    log.set_level('WARNING')
+    results = run_benchmarks(grids, args.dummies, args.trials, args.repeat, args.min_time, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+
+    if not args.baseline:
+        print_results(results)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    rows = compare(results, baseline, args.threshold)
+    print_results(results, rows)
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        sys.stderr.write("{} of {} benchmarks regressed by more than {:.0%}\n".format(len(regressions), len(rows), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,110 @@
+import os
+import struct
+
+import numpy as np
+
+from qtable import STATES, ACTIONS, ArrayQTable, DictQTable, table_arrays
+from events import log
+
+# File layout: a fixed 64-byte header, then the Q-values (float64) and visit counts (int64)
+# as little-endian (n_states, n_actions) arrays, so both can be memory-mapped in place
+MAGIC = b'SCQT'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIqd')  # magic, version, n_states, n_actions, agent time, gamma
+HEADER_SIZE = 64
+
+
+def save_checkpoint(path, agent):
+    """
+    Save a LearningAgent's Q-table, visit counts and time counter.
+
+    The checkpoint is written to a temporary file and moved into place, so readers never
+    see a partial file.
+
+    Parameters:
+    path (str): Checkpoint file.
+    agent (LearningAgent): The agent to save.
+    """
+    q, visits = table_arrays(agent.qs)
+    write_checkpoint(path, q, visits, agent.time, agent.gamma)
+
+
+def write_checkpoint(path, q, visits, time, gamma):
+    """
+    Write Q-values and visit counts to a checkpoint file atomically (see save_checkpoint).
+
+    Parameters:
+    path (str): Checkpoint file.
+    q (ndarray): (n_states, n_actions) Q-values.
+    visits (ndarray): (n_states, n_actions) visit counts.
+    time (int): The agent's time counter.
+    gamma (float): The discount factor.
+    """
+    tmp_path = '{}.tmp{}'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(STATES), len(ACTIONS), time, gamma).ljust(HEADER_SIZE, b'\0'))
+        np.asarray(q).astype('<f8').tofile(f)
+        np.asarray(visits).astype('<i8').tofile(f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, mode='c'):
+    """
+    Memory-map a checkpoint written by save_checkpoint.
+
+    Parameters:
+    path (str): Checkpoint file.
+    mode (str): 'r' to share the table read-only between processes (pages are shared through
+        the OS page cache), 'c' for a private copy-on-write table to keep training, or 'r+'
+        to write changes back to the file.
+
+    Returns:
+    tuple: (q, visits, time, gamma) where q and visits are (n_states, n_actions) memory-mapped arrays.
+    """
+    with open(path, 'rb') as f:
+        magic, version, n_states, n_actions, time, gamma = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a version {} Q-table checkpoint".format(path, VERSION))
+    if (n_states, n_actions) != (len(STATES), len(ACTIONS)):
+        raise ValueError("{} holds a {}x{} Q-table, expected {}x{}".format(path, n_states, n_actions, len(STATES), len(ACTIONS)))
+    shape = (n_states, n_actions)
+    q = np.memmap(path, dtype='<f8', mode=mode, offset=HEADER_SIZE, shape=shape)
+    visits = np.memmap(path, dtype='<i8', mode=mode, offset=HEADER_SIZE + q.nbytes, shape=shape)
+    return q, visits, time, gamma
+
+
+def restore_agent(agent, path, mode='c', use_saved_gamma=False):
+    """
+    Warm-start a LearningAgent from a checkpoint.
+
+    An ArrayQTable uses the memory-mapped arrays directly, so restoring takes no copying;
+    a DictQTable is refilled from them.
+
+    Parameters:
+    agent (LearningAgent): The agent to restore.
+    path (str): Checkpoint file.
+    mode (str): Memory-map mode (see load_checkpoint); with 'r' the agent can act but not learn.
+    use_saved_gamma (bool): Whether to replace the agent's discount factor with the one the
+        checkpoint was trained with. If False, the agent keeps its own and a warning is
+        logged when the two differ.
+    """
+    q, visits, agent.time, gamma = load_checkpoint(path, mode)
+    if use_saved_gamma:
+        agent.gamma = gamma
+    elif gamma != agent.gamma:
+        log.warning('restore_agent', "restore_agent(): {} was trained with gamma = {}; keeping the agent's gamma = {}", path, gamma, agent.gamma)
+    table = agent.qs
+    if isinstance(table, ArrayQTable):
+        table.q = q
+        table.visits = visits
+        table.invalidate()
+    elif isinstance(table, DictQTable):
+        table.qs = {}
+        table.visits = {}
+        for i, j in zip(*np.nonzero(visits)):
+            key = (STATES[i], ACTIONS[j])
+            table.qs[key] = float(q[i, j])
+            table.visits[key] = int(visits[i, j])
+    else:
+        raise TypeError("Unsupported Q-table type: {}".format(type(table).__name__))
+
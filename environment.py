@@ -1,40 +1,379 @@
 import time
+import array
 import random
-from collections import OrderedDict
+from operator import attrgetter
+from collections.abc import Mapping
 
-from simulator import Simulator
+import numpy as np
+
+from events import log
+
+agent_id = attrgetter('id')
 
 class TrafficLight(object):
-    """A traffic light that switches periodically."""
+    """A traffic light that switches periodically.
+
+    A light is a view of one entry in a TrafficLights set; its state at any time step is
+    computed on demand from its phase parameters rather than toggled every tick.
+    """
 
     valid_states = [True, False]  # True = NS open, False = EW open
 
-    def __init__(self, state=None, period=None):
+    __slots__ = ('lights', 'index')
+
+    def __init__(self, lights, index):
         """
         Initialize a TrafficLight.
 
         Parameters:
-        state (bool): Initial state of the traffic light (True for NS, False for EW).
-        period (int): Period of the traffic light switch in time steps.
+        lights (TrafficLights): The set of lights this light belongs to.
+        index (int): Index of this light within the set.
+        """
+        self.lights = lights
+        self.index = index
+
+    @property
+    def state(self):
+        """State of the light at the time step the set was last evaluated at (True for NS, False for EW)."""
+        return self.lights.state(self.index)
+
+    @property
+    def period(self):
+        """Period of the traffic light switch in time steps."""
+        return self.lights.period[self.index]
+
+    def state_at(self, t):
+        """
+        Compute the state of the light at a time step of the current trial.
+
+        Parameters:
+        t (int): Time step.
+
+        Returns:
+        bool: True for NS open, False for EW open.
+        """
+        return self.lights.state(self.index, t)
+
+
+class TrafficLights(object):
+    """Phase parameters of a set of traffic lights, stored as parallel typed arrays.
+
+    A light starts each trial in its initial state and toggles every `period` time steps,
+    so its state at time t is initial XOR (t // period) mod 2.
+    """
+
+    __slots__ = ('initial', 'period', 't')
+
+    def __init__(self, n, states=None, periods=None, rng=random):
+        """
+        Initialize a TrafficLights set.
+
+        Parameters:
+        n (int): Number of lights.
+        states (list): Initial states (True for NS, False for EW); random if None.
+        periods (list): Periods in time steps; random (3, 4 or 5) if None.
+        rng (Random): Random number generator to draw states and periods from.
+        """
+        self.initial = array.array('b', bytes(n))
+        self.period = array.array('i', [0] * n)
+        for i in range(n):
+            self.initial[i] = states[i] if states is not None else rng.choice(TrafficLight.valid_states)
+            self.period[i] = periods[i] if periods is not None else rng.choice([3, 4, 5])
+        self.t = 0  # Time step the lights are currently evaluated at
+
+    def __len__(self):
+        return len(self.period)
+
+    def state(self, i, t=None):
+        """
+        Get the state of light i at time step t (the current time step if None).
+
+        Returns:
+        bool: True for NS open, False for EW open.
         """
-        self.state = state if state is not None else random.choice(self.valid_states)
-        self.period = period if period is not None else random.choice([3, 4, 5])
-        self.last_updated = 0  # Time step when the light was last updated
+        return self.initial[i] != ((self.t if t is None else t) // self.period[i]) & 1
+
+    def next_toggle(self, i):
+        """Get the first time step after the current one at which light i toggles."""
+        return (self.t // self.period[i] + 1) * self.period[i]
+
+    def states(self, t=None):
+        """
+        Evaluate every light at time step t (the current time step if None) in one vectorized call.
+
+        Returns:
+        ndarray: Boolean states, True for NS open.
+        """
+        t = self.t if t is None else t
+        return np.frombuffer(self.initial, dtype=np.int8) != (t // np.frombuffer(self.period, dtype=np.intc)) & 1
 
     def reset(self):
-        """Reset the traffic light's last updated time."""
-        self.last_updated = 0
+        """Start a new trial: each light keeps its current state, and time restarts at 0."""
+        if self.t:
+            initial = np.frombuffer(self.initial, dtype=np.int8)
+            initial[:] = self.states()
+        self.t = 0
 
-    def update(self, t):
+    def randomize(self, rng):
         """
-        Update the traffic light's state based on the current time step.
+        Start a new trial with states and periods drawn afresh, independent of earlier trials.
 
         Parameters:
-        t (int): Current time step.
+        rng (Random): Random number generator to draw states and periods from.
         """
-        if t - self.last_updated >= self.period:
-            self.state = not self.state  # Toggle the state
-            self.last_updated = t  # Update the last updated time
+        for i in range(len(self.period)):
+            self.initial[i] = rng.choice(TrafficLight.valid_states)
+            self.period[i] = rng.choice([3, 4, 5])
+        self.t = 0
+
+
+class Intersections(Mapping):
+    """The intersections of a grid, mapping (x, y) to the TrafficLight there.
+
+    Nothing is stored per intersection: locations are generated from the grid bounds and
+    lights are views created on access, so very large grids cost nothing to construct.
+    Locations are ordered column by column, the order of their index in the lights set.
+    """
+
+    def __init__(self, bounds, lights):
+        """
+        Initialize the intersections of a grid.
+
+        Parameters:
+        bounds (tuple): Grid bounds as (min x, min y, max x, max y).
+        lights (TrafficLights): One light per intersection, in location index order.
+        """
+        self.bounds = bounds
+        self.lights = lights
+        self.rows = bounds[3] - bounds[1] + 1
+
+    def __getitem__(self, location):
+        if location not in self:
+            raise KeyError(location)
+        return TrafficLight(self.lights, self.index(location))
+
+    def __contains__(self, location):
+        try:
+            x, y = location
+        except (TypeError, ValueError):
+            return False
+        return self.bounds[0] <= x <= self.bounds[2] and self.bounds[1] <= y <= self.bounds[3]
+
+    def __iter__(self):
+        for x in range(self.bounds[0], self.bounds[2] + 1):
+            for y in range(self.bounds[1], self.bounds[3] + 1):
+                yield (x, y)
+
+    def __len__(self):
+        return len(self.lights)
+
+    def index(self, location):
+        """Get the index of an intersection (x, y)."""
+        return (location[0] - self.bounds[0]) * self.rows + location[1] - self.bounds[1]
+
+    def location(self, index):
+        """Get the intersection (x, y) with the given index."""
+        return (index // self.rows + self.bounds[0], index % self.rows + self.bounds[1])
+
+
+class Roads(object):
+    """The roads of a grid as (intersection, intersection) pairs in both directions, generated on demand."""
+
+    def __init__(self, intersections):
+        """
+        Initialize the roads between adjacent intersections.
+
+        Parameters:
+        intersections (Intersections): The intersections of the grid.
+        """
+        self.intersections = intersections
+
+    def __iter__(self):
+        min_x, min_y, max_x, max_y = self.intersections.bounds
+        for x, y in self.intersections:
+            for neighbor in ((x - 1, y), (x, y - 1), (x, y + 1), (x + 1, y)):
+                if min_x <= neighbor[0] <= max_x and min_y <= neighbor[1] <= max_y:
+                    yield ((x, y), neighbor)
+
+    def __len__(self):
+        min_x, min_y, max_x, max_y = self.intersections.bounds
+        cols, rows = max_x - min_x + 1, max_y - min_y + 1
+        return 2 * ((cols - 1) * rows + cols * (rows - 1))
+
+
+def check_grid_size(grid_size):
+    """
+    Check that a grid is large enough to set up trials on.
+
+    Parameters:
+    grid_size (tuple): Grid size as (cols, rows).
+
+    Raises:
+    ValueError: If no two intersections are Environment.min_trip_distance apart.
+    """
+    cols, rows = grid_size
+    if cols < 1 or rows < 1 or (cols - 1) + (rows - 1) < Environment.min_trip_distance:
+        raise ValueError("grid_size {} is too small: a trip must cover at least {} blocks, so cols + rows must be at least {}".format(
+            tuple(grid_size), Environment.min_trip_distance, Environment.min_trip_distance + 2))
+
+
+def build_transition_table(grid_size):
+    """
+    Build the movement model of a wrap-around grid.
+
+    Intersections are indexed column by column, (x, y) -> (x - 1) * rows + (y - 1), which
+    is the order of Environment.intersections. Headings and actions are indexed by their
+    positions in Environment.valid_headings and Environment.valid_actions. The table gives
+    the outcome of an action that the traffic rules allow; a null action stays put.
+
+    Parameters:
+    grid_size (tuple): Grid size as (cols, rows).
+
+    Returns:
+    tuple: (next_location, next_heading) integer arrays of shape (cols * rows, 4, 4).
+    """
+    cols, rows = grid_size
+    heading_x = np.array([h[0] for h in Environment.valid_headings])
+    heading_y = np.array([h[1] for h in Environment.valid_headings])
+
+    # Heading after each action: left turns counter-clockwise through ENWS, right clockwise
+    headings = np.arange(4)
+    turns = np.stack([headings, headings, (headings + 1) % 4, (headings + 3) % 4], axis=1)
+
+    location = np.arange(cols * rows)
+    x, y = location // rows, location % rows
+    next_heading = np.broadcast_to(turns, (cols * rows, 4, 4))
+    next_x = (x[:, None, None] + heading_x[next_heading]) % cols
+    next_y = (y[:, None, None] + heading_y[next_heading]) % rows
+    next_location = next_x * rows + next_y
+    next_location[:, :, 0] = location[:, None]  # A null action does not move
+    return next_location, next_heading.copy()
+
+
+class AgentState(Mapping):
+    """View of one agent's entry in an AgentStates store, readable and writable like the dict it replaces.
+
+    Writing a location or heading keeps the environment's occupancy index and observation
+    cache in step, as if the car had driven there.
+    """
+
+    __slots__ = ('states', 'id')
+    fields = ('location', 'heading', 'destination', 'deadline')
+
+    def __init__(self, states, agent_id):
+        self.states = states
+        self.id = agent_id
+
+    def __getitem__(self, key):
+        states = self.states
+        if key == 'location':
+            return states.intersections.location(states.location[self.id])
+        elif key == 'heading':
+            return Environment.valid_headings[states.heading[self.id]]
+        elif key == 'destination':
+            destination = states.destination[self.id]
+            return states.intersections.location(destination) if destination >= 0 else None
+        elif key == 'deadline':
+            return states.deadline[self.id] if states.has_deadline[self.id] else None
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        states = self.states
+        env = states.env
+        if key == 'location':
+            agent = states.agents[self.id]
+            location = states.intersections.index(value)
+            if env is not None and agent in env.occupancy.get(states.location[self.id], ()):
+                env.remove_agent(agent, states.location[self.id])
+            states.location[self.id] = location
+            if env is not None:
+                env.place_agent(agent, location)
+        elif key == 'heading':
+            states.heading[self.id] = Environment.valid_headings.index(value)
+            if env is not None:
+                env.obs_cache.pop(states.location[self.id], None)  # Other cars see this one differently
+        elif key == 'destination':
+            states.destination[self.id] = states.intersections.index(value) if value is not None else -1
+        elif key == 'deadline':
+            states.has_deadline[self.id] = value is not None
+            states.deadline[self.id] = value if value is not None else 0
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class AgentStates(Mapping):
+    """State of every agent, stored as parallel typed arrays indexed by agent id.
+
+    Agents are numbered in creation order. Locations and destinations are intersection
+    indices and headings are indices into Environment.valid_headings; agent_states[agent]
+    returns an AgentState view that converts them back to tuples.
+    """
+
+    def __init__(self, intersections, env=None):
+        """
+        Initialize an empty AgentStates store.
+
+        Parameters:
+        intersections (Intersections): The intersections of the grid the agents drive on.
+        env (Environment): The environment whose occupancy index and observation cache follow writes through AgentState views.
+        """
+        self.intersections = intersections
+        self.env = env
+        self.agents = []  # Agents by id
+        self.location = array.array('i')
+        self.heading = array.array('b')
+        self.destination = array.array('i')  # -1 when the agent has no destination
+        self.deadline = array.array('i')
+        self.has_deadline = array.array('b')
+
+    def add(self, agent, location, heading):
+        """
+        Add an agent without a destination or deadline.
+
+        Parameters:
+        agent (Agent): The agent to add.
+        location (int): Index of its intersection.
+        heading (int): Index of its heading.
+
+        Returns:
+        int: The agent's id.
+        """
+        self.agents.append(agent)
+        self.location.append(location)
+        self.heading.append(heading)
+        self.destination.append(-1)
+        self.deadline.append(0)
+        self.has_deadline.append(False)
+        return len(self.agents) - 1
+
+    def __getitem__(self, agent):
+        if agent not in self:
+            raise KeyError(agent)
+        return AgentState(self, agent.id)
+
+    def __setitem__(self, agent, state):
+        view = self[agent]
+        for key in AgentState.fields:
+            view[key] = state.get(key)
+
+    def __contains__(self, agent):
+        agent_id = getattr(agent, 'id', None)
+        return agent_id is not None and agent_id < len(self.agents) and self.agents[agent_id] is agent
+
+    def __iter__(self):
+        return iter(self.agents)
+
+    def __len__(self):
+        return len(self.agents)
 
 
 class Environment(object):
@@ -44,38 +383,58 @@ class Environment(object):
     valid_inputs = {'light': TrafficLight.valid_states, 'oncoming': valid_actions, 'left': valid_actions, 'right': valid_actions}
     valid_headings = [(1, 0), (0, -1), (-1, 0), (0, 1)]  # ENWS
     hard_time_limit = -100  # End trial when deadline reaches this value to avoid deadlocks
+    min_trip_distance = 4  # Minimum distance between the primary agent's start and destination
+
+    action_ids = {action: i for i, action in enumerate(valid_actions)}
+    max_table_intersections = 4096  # Larger grids compute transitions instead of building a table
 
-    def __init__(self):
+    def __init__(self, grid_size=(8, 6), num_dummies=3, seed=None):
         """
         Initialize the environment.
+
+        Parameters:
+        grid_size (tuple): Grid size as (cols, rows).
+        num_dummies (int): Number of dummy agents.
+        seed (int): Seed of the environment's own random number generator. Every trial of a
+            seeded environment is set up from a stream derived from (seed, trial number), so
+            it can be reproduced on its own. If None, the global random module is used.
         """
+        check_grid_size(grid_size)
+        self.seed = seed
+        self.random = random.Random(seed) if seed is not None else random  # Drawn from by the environment and its agents
         self.done = False  # Indicates if the trial is done
+        self.success = False  # Indicates if the primary agent reached its destination this trial
         self.t = 0  # Time step counter
-        self.agent_states = OrderedDict()  # Store agent states
-        self.status_text = ""  # Status text for debugging
+        self.trial = -1  # Number of the current trial
+        self.recorder = None  # Optional TraceRecorder for the primary agent's steps
+        self.occupancy = {}  # Agents at each occupied intersection, keyed by intersection index
+        self.obs_cache = {}  # Cached sense() results per intersection index, as [expiry time step, {agent: inputs}]
+        self.obs_cache_hits = 0
+        self.obs_cache_misses = 0
+        self.status = None  # (state, action, reward) of the primary agent's last action
 
         # Road network
-        self.grid_size = (8, 6)  # (cols, rows)
+        self.grid_size = tuple(grid_size)  # (cols, rows)
         self.bounds = (1, 1, self.grid_size[0], self.grid_size[1])
         self.block_size = 100
-        self.intersections = OrderedDict()  # Store traffic lights at intersections
-        self.roads = []  # Store road connections
 
-        # Initialize intersections with traffic lights
-        for x in range(self.bounds[0], self.bounds[2] + 1):
-            for y in range(self.bounds[1], self.bounds[3] + 1):
-                self.intersections[(x, y)] = TrafficLight()  # A traffic light at each intersection
-
-        # Initialize roads between adjacent intersections
-        for a in self.intersections:
-            for b in self.intersections:
-                if a == b:
-                    continue
-                if (abs(a[0] - b[0]) + abs(a[1] - b[1])) == 1:  # L1 distance = 1
-                    self.roads.append((a, b))
+        # Intersections with a traffic light each, and the roads between adjacent ones
+        self.lights = TrafficLights(self.grid_size[0] * self.grid_size[1], rng=self.random)
+        self.intersections = Intersections(self.bounds, self.lights)
+        self.roads = Roads(self.intersections)
+        self.agent_states = AgentStates(self.intersections, self)  # Store agent states
+
+        # Movement model: (location, heading, action) -> (new location, new heading), as flat
+        # lists indexed by (location * 4 + heading) * 4 + action
+        self.next_location = None
+        self.next_heading = None
+        if len(self.intersections) <= self.max_table_intersections:
+            next_location, next_heading = build_transition_table(self.grid_size)
+            self.next_location = next_location.ravel().tolist()
+            self.next_heading = next_heading.ravel().tolist()
 
         # Dummy agents
-        self.num_dummies = 3  # Number of dummy agents
+        self.num_dummies = num_dummies  # Number of dummy agents
         for i in range(self.num_dummies):
             self.create_agent(DummyAgent)
 
@@ -91,9 +450,85 @@ class Environment(object):
         agent_class (class): The class of the agent to create.
         """
         agent = agent_class(self, *args, **kwargs)
-        self.agent_states[agent] = {'location': random.choice(list(self.intersections.keys())), 'heading': (0, 1)}
+        location = self.random.randrange(len(self.intersections))
+        agent.id = self.agent_states.add(agent, location, self.valid_headings.index((0, 1)))
+        self.place_agent(agent, location)
         return agent
 
+    def random_location(self):
+        """
+        Pick an intersection uniformly at random.
+
+        Returns:
+        tuple: The intersection (x, y).
+        """
+        return self.intersections.location(self.random.randrange(len(self.intersections)))
+
+    def move(self, location, heading, action):
+        """
+        Look up where an allowed action takes a car.
+
+        Parameters:
+        location (tuple): The car's intersection (x, y).
+        heading (tuple): The car's heading.
+        action (str): The action taken.
+
+        Returns:
+        tuple: (new location, new heading).
+        """
+        location, heading = self._move(self.intersections.index(location), self.valid_headings.index(heading), self.action_ids[action])
+        return self.intersections.location(location), self.valid_headings[heading]
+
+    def _move(self, location, heading, action):
+        """Resolve a move by intersection, heading and action index, wrapping around the grid."""
+        if self.next_location is not None:
+            i = (location * 4 + heading) * 4 + action
+            return self.next_location[i], self.next_heading[i]
+        heading = (heading + (0, 0, 1, 3)[action]) % 4  # Left turns counter-clockwise through ENWS
+        if action == 0:
+            return location, heading
+        cols, rows = self.grid_size
+        dx, dy = self.valid_headings[heading]
+        return ((location // rows + dx) % cols) * rows + (location % rows + dy) % rows, heading
+
+    def place_agent(self, agent, location):
+        """
+        Record the agent as occupying the given intersection.
+
+        Parameters:
+        agent (Agent): The agent to place.
+        location (int): Index of the intersection it now occupies.
+        """
+        occupants = self.occupancy.get(location)
+        if occupants is None:
+            occupants = self.occupancy[location] = {}
+        occupants[agent] = None
+        self.obs_cache.pop(location, None)
+
+    def remove_agent(self, agent, location):
+        """
+        Remove the agent from the occupancy index of the given intersection.
+
+        Parameters:
+        agent (Agent): The agent to remove.
+        location (int): Index of the intersection it is leaving.
+        """
+        occupants = self.occupancy[location]
+        del occupants[agent]
+        if not occupants:
+            del self.occupancy[location]
+        self.obs_cache.pop(location, None)
+
+    def waypoint_changed(self, agent):
+        """
+        Invalidate cached observations that include the agent's next waypoint.
+
+        Parameters:
+        agent (Agent): The agent whose next waypoint changed.
+        """
+        if agent in self.agent_states:
+            self.obs_cache.pop(self.agent_states.location[agent.id], None)
+
     def set_primary_agent(self, agent, enforce_deadline=False):
         """
         Set the primary agent in the environment.
@@ -105,62 +540,110 @@ class Environment(object):
         self.primary_agent = agent
         self.enforce_deadline = enforce_deadline
 
-    def reset(self):
-        """Reset the environment for a new trial."""
+    def reset(self, trial=None):
+        """
+        Reset the environment for a new trial.
+
+        In a seeded environment the trial is set up from its own random stream, with fresh
+        traffic lights and dummy traffic, so reset(trial=k) reproduces trial k of any run
+        with the same seed without replaying the trials before it. (A learning agent's
+        behaviour still depends on what it learned in earlier trials.)
+
+        Parameters:
+        trial (int): Number of the trial to set up; the one after the current trial if None.
+        """
         self.done = False
+        self.success = False
         self.t = 0
+        self.trial = self.trial + 1 if trial is None else trial
 
         # Reset traffic lights
-        for traffic_light in self.intersections.values():
-            traffic_light.reset()
+        if self.seed is not None:
+            self.random.seed("{}/{}".format(self.seed, self.trial))
+            self.lights.randomize(self.random)
+        else:
+            self.lights.reset()
 
         # Pick a start and a destination
-        start = random.choice(list(self.intersections.keys()))
-        destination = random.choice(list(self.intersections.keys()))
+        start = self.random_location()
+        destination = self.random_location()
 
         # Ensure starting location and destination are not too close
-        while self.compute_dist(start, destination) < 4:
-            start = random.choice(list(self.intersections.keys()))
-            destination = random.choice(list(self.intersections.keys()))
+        while self.compute_dist(start, destination) < self.min_trip_distance:
+            start = self.random_location()
+            destination = self.random_location()
 
-        start_heading = random.choice(self.valid_headings)
+        start_heading = self.random.randrange(len(self.valid_headings))
         deadline = self.compute_dist(start, destination) * 5
-        print("Environment.reset(): Trial set up with start = {}, destination = {}, deadline = {}".format(start, destination, deadline))
+        log.info('Environment.reset', "Environment.reset(): Trial set up with start = {}, destination = {}, deadline = {}", start, destination, deadline)
 
         # Initialize agents
-        for agent in self.agent_states.keys():
-            self.agent_states[agent] = {
-                'location': start if agent is self.primary_agent else random.choice(list(self.intersections.keys())),
-                'heading': start_heading if agent is self.primary_agent else random.choice(self.valid_headings),
-                'destination': destination if agent is self.primary_agent else None,
-                'deadline': deadline if agent is self.primary_agent else None}
+        self.occupancy.clear()
+        self.obs_cache.clear()
+        states = self.agent_states
+        n_intersections = len(self.intersections)
+        for agent in states.agents:
+            i = agent.id
+            if agent is self.primary_agent:
+                states.location[i] = self.intersections.index(start)
+                states.heading[i] = start_heading
+                states.destination[i] = self.intersections.index(destination)
+                states.deadline[i] = deadline
+                states.has_deadline[i] = True
+            else:
+                states.location[i] = self.random.randrange(n_intersections)
+                states.heading[i] = self.random.randrange(len(self.valid_headings))
+                states.destination[i] = -1
+                states.has_deadline[i] = False
+            self.place_agent(agent, states.location[i])
             agent.reset(destination=(destination if agent is self.primary_agent else None))
 
     def step(self):
         """Advance the environment by one time step."""
-        # Update traffic lights
-        for intersection, traffic_light in self.intersections.items():
-            traffic_light.update(self.t)
+        # Evaluate traffic lights at the new time step (their states are computed on demand)
+        self.lights.t = self.t
 
         # Update agents
-        for agent in self.agent_states.keys():
+        for agent in self.agent_states.agents:
             agent.update(self.t)
 
         self.t += 1
         if self.primary_agent is not None:
-            agent_deadline = self.agent_states[self.primary_agent]['deadline']
+            i = self.primary_agent.id
+            agent_deadline = self.agent_states.deadline[i]
             if agent_deadline <= self.hard_time_limit:
                 self.done = True
-                print("Environment.step(): Primary agent hit hard time limit ({})! Trial aborted.".format(self.hard_time_limit))
+                log.info('Environment.step', "Environment.step(): Primary agent hit hard time limit ({})! Trial aborted.", self.hard_time_limit)
             elif self.enforce_deadline and agent_deadline <= 0:
                 self.done = True
-                print("Environment.step(): Primary agent ran out of time! Trial aborted.")
-            self.agent_states[self.primary_agent]['deadline'] = agent_deadline - 1
+                log.info('Environment.step', "Environment.step(): Primary agent ran out of time! Trial aborted.")
+            self.agent_states.deadline[i] = agent_deadline - 1
+
+    def light(self, location, heading):
+        """
+        Get the color of the light facing a car at an intersection.
+
+        Parameters:
+        location (tuple): The intersection (x, y).
+        heading (tuple): The car's heading.
+
+        Returns:
+        str: 'green' or 'red'.
+        """
+        return self._light(self.intersections.index(location), self.valid_headings.index(heading))
+
+    def _light(self, location, heading):
+        """Get the light color by intersection and heading index (odd headings travel NS)."""
+        return 'green' if self.lights.state(location) == (heading % 2 == 1) else 'red'
 
     def sense(self, agent):
         """
         Sense the state of the environment for the given agent.
 
+        Results are cached until a car at the agent's intersection moves or changes its
+        next waypoint, or the light there next toggles. The returned dict is shared with
+        the cache and must not be modified.
+
         Parameters:
         agent (Agent): The agent sensing the environment.
 
@@ -169,23 +652,40 @@ class Environment(object):
         """
         assert agent in self.agent_states, "Unknown agent!"
 
-        state = self.agent_states[agent]
-        location = state['location']
-        heading = state['heading']
-        light = 'green' if (self.intersections[location].state and heading[1] != 0) or ((not self.intersections[location].state) and heading[0] != 0) else 'red'
-
-        # Populate oncoming, left, right
+        location = self.agent_states.location[agent.id]
+        entry = self.obs_cache.get(location)
+        if entry is None or self.lights.t >= entry[0]:
+            entry = self.obs_cache[location] = [self.lights.next_toggle(location), {}]
+        else:
+            inputs = entry[1].get(agent)
+            if inputs is not None:
+                self.obs_cache_hits += 1
+                return inputs
+        self.obs_cache_misses += 1
+        inputs = entry[1][agent] = self._sense(agent, location, self.agent_states.heading[agent.id])
+        return inputs
+
+    def _sense(self, agent, location, heading):
+        """Compute the sensory inputs of an agent by intersection and heading index."""
+        light = self._light(location, heading)
+
+        # Populate oncoming, left, right from the cars at this intersection only
         oncoming = None
         left = None
         right = None
-        for other_agent, other_state in self.agent_states.items():
-            if agent == other_agent or location != other_state['location'] or (heading[0] == other_state['heading'][0] and heading[1] == other_state['heading'][1]):
+        occupants = self.occupancy[location]
+        if len(occupants) == 1:
+            return {'light': light, 'oncoming': oncoming, 'left': left, 'right': right}
+        headings = self.agent_states.heading
+        for other_agent in sorted(occupants, key=agent_id):
+            relative_heading = (headings[other_agent.id] - heading) % 4
+            if relative_heading == 0:  # Same heading (or the agent itself)
                 continue
             other_heading = other_agent.get_next_waypoint()
-            if (heading[0] * other_state['heading'][0] + heading[1] * other_state['heading'][1]) == -1:
+            if relative_heading == 2:  # Oncoming
                 if oncoming != 'left':  # We don't want to override oncoming == 'left'
                     oncoming = other_heading
-            elif (heading[1] == other_state['heading'][0] and -heading[0] == other_state['heading'][1]):
+            elif relative_heading == 1:  # Coming from the right, heading to our left
                 if right != 'forward' and right != 'left':  # We don't want to override right == 'forward or 'left'
                     right = other_heading
             else:
@@ -204,7 +704,7 @@ class Environment(object):
         Returns:
         int: The deadline for the agent.
         """
-        return self.agent_states[agent]['deadline'] if agent is self.primary_agent else None
+        return self.agent_states.deadline[agent.id] if agent is self.primary_agent else None
 
     def act(self, agent, action):
         """
@@ -220,37 +720,33 @@ class Environment(object):
         assert agent in self.agent_states, "Unknown agent!"
         assert action in self.valid_actions, "Invalid action!"
 
-        state = self.agent_states[agent]
-        location = state['location']
-        heading = state['heading']
-        light = 'green' if (self.intersections[location].state and heading[1] != 0) or ((not self.intersections[location].state) and heading[0] != 0) else 'red'
+        states = self.agent_states
+        i = agent.id
         sense = self.sense(agent)
+        light = sense['light']
 
-        # Move agent if within bounds and obeys traffic rules
+        # Move agent if it obeys traffic rules
         reward = 0  # Reward/penalty
         move_okay = True
         if action == 'forward':
             if light != 'green':
                 move_okay = False
         elif action == 'left':
-            if light == 'green' and (sense['oncoming'] == None or sense['oncoming'] == 'left'):
-                heading = (heading[1], -heading[0])
-            else:
+            if not (light == 'green' and (sense['oncoming'] == None or sense['oncoming'] == 'left')):
                 move_okay = False
         elif action == 'right':
-            if light == 'green' or sense['left'] != 'straight':
-                heading = (-heading[1], heading[0])
-            else:
+            if not (light == 'green' or sense['left'] != 'straight'):
                 move_okay = False
 
         if move_okay:
             # Valid move (could be null)
             if action is not None:
-                # Valid non-null move
-                location = ((location[0] + heading[0] - self.bounds[0]) % (self.bounds[2] - self.bounds[0] + 1) + self.bounds[0],
-                            (location[1] + heading[1] - self.bounds[1]) % (self.bounds[3] - self.bounds[1] + 1) + self.bounds[1])  # wrap-around
-                state['location'] = location
-                state['heading'] = heading
+                # Valid non-null move, looked up in the movement model (wraps around the grid)
+                location, heading = self._move(states.location[i], states.heading[i], self.action_ids[action])
+                self.remove_agent(agent, states.location[i])
+                self.place_agent(agent, location)
+                states.location[i] = location
+                states.heading[i] = heading
                 reward = 2.0 if action == agent.get_next_waypoint() else -0.5  # Valid, but is it correct? (as per waypoint)
             else:
                 # Valid null move
@@ -260,15 +756,25 @@ class Environment(object):
             reward = -1.0
 
         if agent is self.primary_agent:
-            if state['location'] == state['destination']:
-                if state['deadline'] >= 0:
+            if states.location[i] == states.destination[i]:
+                if states.deadline[i] >= 0:
                     reward += 10  # Bonus for reaching destination on time
                 self.done = True
-                print("Environment.act(): Primary agent has reached destination!")  # [debug]
-            self.status_text = "state: {}\naction: {}\nreward: {}".format(agent.get_state(), action, reward)
+                self.success = True
+                log.info('Environment.act', "Environment.act(): Primary agent has reached destination!")
+            self.status = (agent.get_state(), action, reward)  # Formatted into status_text only when displayed
+            if self.recorder is not None:
+                self.recorder.record_step(self.t, self.status[0], action, reward, states.deadline[i])
 
         return reward
 
+    @property
+    def status_text(self):
+        """Status text for debugging, formatted from the primary agent's last action on access."""
+        if self.status is None:
+            return ""
+        return "state: {}\naction: {}\nreward: {}".format(*self.status)
+
     def compute_dist(self, a, b):
         """
         Compute the L1 distance between two points.
@@ -286,6 +792,8 @@ class Environment(object):
 class Agent(object):
     """Base class for all agents."""
 
+    __slots__ = ('env', 'id', 'state', '_next_waypoint', 'color', '_sprite', '_sprite_size')
+
     def __init__(self, env):
         """
         Initialize an agent.
@@ -294,10 +802,22 @@ class Agent(object):
         env (Environment): The environment the agent interacts with.
         """
         self.env = env
+        self.id = None  # Index into the environment's agent state arrays, set when added
         self.state = None
-        self.next_waypoint = None
+        self._next_waypoint = None
         self.color = 'cyan'  # Default color
 
+    @property
+    def next_waypoint(self):
+        """The agent's next waypoint; setting it invalidates observations that include it."""
+        return self._next_waypoint
+
+    @next_waypoint.setter
+    def next_waypoint(self, waypoint):
+        if waypoint != self._next_waypoint:
+            self._next_waypoint = waypoint
+            self.env.waypoint_changed(self)
+
     def reset(self, destination=None):
         """Reset the agent for a new trial."""
         pass
@@ -312,12 +832,14 @@ class Agent(object):
 
     def get_next_waypoint(self):
         """Get the agent's next waypoint."""
-        return self.next_waypoint
+        return self._next_waypoint
 
 
 class DummyAgent(Agent):
     color_choices = ['blue', 'cyan', 'magenta', 'orange']
 
+    __slots__ = ()
+
     def __init__(self, env):
         """
         Initialize a DummyAgent.
@@ -326,8 +848,13 @@ class DummyAgent(Agent):
         env (Environment): The environment instance the agent interacts with.
         """
         super(DummyAgent, self).__init__(env)  # Initialize the parent class (Agent)
-        self.next_waypoint = random.choice(Environment.valid_actions[1:])  # Randomly choose the next waypoint
-        self.color = random.choice(self.color_choices)  # Randomly choose a color for the agent
+        self.next_waypoint = env.random.choice(Environment.valid_actions[1:])  # Randomly choose the next waypoint
+        self.color = env.random.choice(self.color_choices)  # Randomly choose a color for the agent
+
+    def reset(self, destination=None):
+        """Reset the dummy agent for a new trial; in a seeded environment its waypoint is redrawn so trials don't depend on earlier ones."""
+        if self.env.seed is not None:
+            self.next_waypoint = self.env.random.choice(Environment.valid_actions[1:])
 
     def update(self, t):
         """
@@ -352,7 +879,7 @@ class DummyAgent(Agent):
         action = None
         if action_okay:
             action = self.next_waypoint
-            self.next_waypoint = random.choice(Environment.valid_actions[1:])  # Choose the next waypoint randomly
+            self.next_waypoint = self.env.random.choice(Environment.valid_actions[1:])  # Choose the next waypoint randomly
         reward = self.env.act(self, action)  # Perform the action and get the reward
         #print "DummyAgent.update(): t = {}, inputs = {}, action = {}, reward = {}".format(t, inputs, action, reward)  # [debug]
         #print "DummyAgent.update(): next_waypoint = {}".format(self.next_waypoint)  # [debug]
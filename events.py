@@ -0,0 +1,119 @@
+import os
+import sys
+from collections import deque
+
+# Event levels, from most to least verbose
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+level_names = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'OFF': OFF}
+
+
+class EventLog(object):
+    """Level-gated event log with a bounded in-memory ring buffer of recent events.
+
+    An event is a source name, a message template and its arguments; the message is only
+    formatted when it is echoed to the stream or read back. Events below the log's level
+    are dropped on entry, and hot paths check the *_enabled flags first so a disabled
+    level costs a single attribute lookup.
+    """
+
+    def __init__(self, level=INFO, capacity=1000, stream=None, echo=True):
+        """
+        Initialize an EventLog.
+
+        Parameters:
+        level (int): Minimum level of events to record.
+        capacity (int): Number of recent events kept in the ring buffer.
+        stream (file): Stream that events are echoed to (stdout if None).
+        echo (bool): Whether to write events to the stream as they happen.
+        """
+        self.buffer = deque(maxlen=capacity)
+        self.stream = stream
+        self.echo = echo
+        self.set_level(level)
+
+    def set_level(self, level):
+        """
+        Set the minimum level of events to record.
+
+        Parameters:
+        level (int or str): A level constant or its name ('DEBUG', 'INFO', 'WARNING', 'OFF').
+
+        Raises:
+        ValueError: If the level is a string that is not a level name.
+        """
+        if isinstance(level, str):
+            if level.upper() not in level_names:
+                raise ValueError("Unknown log level {!r}; expected one of {}".format(level, ', '.join(level_names)))
+            level = level_names[level.upper()]
+        self.level = level
+        self.debug_enabled = self.level <= DEBUG
+        self.info_enabled = self.level <= INFO
+        self.warning_enabled = self.level <= WARNING
+
+    def emit(self, level, source, message, *args):
+        """
+        Record an event if its level is enabled.
+
+        Parameters:
+        level (int): Level of the event.
+        source (str): Where the event comes from, e.g. 'Environment.act'.
+        message (str): Message template, formatted with str.format(*args) on demand.
+        """
+        if level < self.level:
+            return
+        event = (level, source, message, args)
+        self.buffer.append(event)
+        if self.echo:
+            (self.stream or sys.stdout).write(self.format(event) + '\n')
+
+    def debug(self, source, message, *args):
+        """Record a DEBUG event (see emit)."""
+        if self.debug_enabled:
+            self.emit(DEBUG, source, message, *args)
+
+    def info(self, source, message, *args):
+        """Record an INFO event (see emit)."""
+        if self.info_enabled:
+            self.emit(INFO, source, message, *args)
+
+    def warning(self, source, message, *args):
+        """Record a WARNING event (see emit)."""
+        if self.warning_enabled:
+            self.emit(WARNING, source, message, *args)
+
+    def format(self, event):
+        """
+        Format an event as a line of text.
+
+        Parameters:
+        event (tuple): A (level, source, message, args) event from the buffer.
+
+        Returns:
+        str: The formatted message.
+        """
+        level, source, message, args = event
+        return message.format(*args) if args else message
+
+    def recent(self, n=None):
+        """
+        Get the most recent events, formatted.
+
+        Parameters:
+        n (int): Number of events to return; all buffered events if None.
+
+        Returns:
+        list: Formatted messages, oldest first.
+        """
+        events = list(self.buffer)
+        return [self.format(event) for event in (events[max(len(events) - n, 0):] if n is not None else events)]
+
+
+# Process-wide event log; the level can be preset with the SMARTCAB_LOG environment variable
+log = EventLog()
+try:
+    log.set_level(os.environ.get('SMARTCAB_LOG', 'INFO'))
+except ValueError as e:
+    sys.stderr.write("events: {}; using INFO\n".format(e))
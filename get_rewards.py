@@ -1,44 +1,276 @@
-import csv
-import codecs
-
-# Open the CSV file with utf-16 encoding
-with codecs.open("model_output.csv", "r", "utf-16") as f:
-    csvread = csv.reader(f, delimiter='\n')
-    next(csvread)  # Skip the header row if there is one
-
-    lines_list = []
-    passes = 0
-    fails = 0
-    rewards = []
-    errors = []
-    total_rewards = 0
-
-    # Read lines from the CSV file into lines_list
-    for line in csvread:
-        lines_list.append(line[0])
-
-    lines_iter = iter(lines_list)
-
-    # Process each line in the list
-    for line in lines_iter:
-        if line == 'Environment.act(): Primary agent has reached destination!':
-            passes += 1
-        elif line == 'Environment.step(): Primary agent ran out of time! Trial aborted.':
-            fails += 1
-        elif line == 'Reward is':
-            reward_line = next(lines_iter, None)
+import os
+import sys
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Lines of the legacy stdout log (model_output.csv) that the analyzer counts
+PASS_LINE = 'Environment.act(): Primary agent has reached destination!'
+FAIL_LINE = 'Environment.step(): Primary agent ran out of time! Trial aborted.'
+ABORT_PREFIX = 'Environment.step(): Primary agent hit hard time limit'
+TRIAL_PREFIX = 'Simulator.run(): Trial '
+REWARD_LINE = 'Reward is'
+
+BLOCK_SIZE = 1 << 20  # Most bytes read at a time; even, so UTF-16 code units never straddle blocks
+LOOKAHEAD = 4096  # Bytes read past the end of a chunk to finish its last lines
+MIN_CHUNK_SIZE = 1 << 16  # Smaller chunks cost more in process overhead than they save
+
+
+def detect_encoding(path):
+    """
+    Detect the byte order of a UTF-16 log from its byte order mark.
+
+    Parameters:
+    path (str): The log file.
+
+    Returns:
+    tuple: (codec name, offset of the first code unit after the BOM).
+    """
+    with open(path, 'rb') as f:
+        bom = f.read(2)
+    if bom == b'\xfe\xff':
+        return 'utf-16-be', 2
+    elif bom == b'\xff\xfe':
+        return 'utf-16-le', 2
+    return 'utf-16-le', 0
+
+
+def read_lines(path, encoding, start, end, data_start):
+    """
+    Stream the lines whose first byte lies in [start, end), followed by the line after them.
+
+    The extra line lets a 'Reward is' line at the end of a chunk see its value; it is
+    also the first line of the next chunk, where it is processed in its own right.
+
+    Parameters:
+    path (str): The log file.
+    encoding (str): 'utf-16-le' or 'utf-16-be'.
+    start (int): Byte offset of the chunk (an even distance from data_start).
+    end (int): Byte offset just past the chunk.
+    data_start (int): Byte offset of the first code unit after the BOM.
+
+    Yields:
+    tuple: (line, True if the line starts inside the chunk).
+    """
+    units = np.dtype('<u2' if encoding == 'utf-16-le' else '>u2')
+    with open(path, 'rb') as f:
+        # Unless the chunk starts the file, skip to the first line that starts at or after start
+        position = start
+        if start > data_start:
+            position = start - 2
+        f.seek(position)
+        skipping = start > data_start
+        pending = b''
+        line_start = position
+        while True:
+            # Read no further than the chunk needs, so small chunks don't rescan their neighbours
+            block = f.read(min(BLOCK_SIZE, max(end - f.tell(), 0) + LOOKAHEAD))
+            if not block:
+                break
+            data = pending + block
+            newlines = np.flatnonzero(np.frombuffer(data[:len(data) - len(data) % 2], dtype=units) == 0x0A) * 2
+            offset = 0
+            for newline in newlines.tolist():
+                if skipping:
+                    skipping = False
+                else:
+                    inside = line_start < end
+                    yield data[offset:newline].decode(encoding).rstrip('\r'), inside
+                    if not inside:
+                        return
+                offset = newline + 2
+                line_start = position + offset
+            pending = data[offset:]
+            position += offset
+        if pending and not skipping:
+            yield pending.decode(encoding, errors='replace').rstrip('\r'), line_start < end
+
+
+class LogStats(object):
+    """Totals and per-trial results accumulated from a stretch of a legacy log."""
+
+    def __init__(self, keep_trials=False):
+        """
+        Initialize empty statistics.
+
+        Parameters:
+        keep_trials (bool): Whether to keep per-trial results.
+        """
+        self.passes = 0
+        self.fails = 0
+        self.total_rewards = 0.0
+        self.total_errors = 0.0
+        self.keep_trials = keep_trials
+        self.head = [None, 0.0, 0.0]  # [status, reward, errors] before the first trial marker
+        self.trials = []  # [status, reward, errors] of each trial started in this stretch
+
+    def current(self):
+        """Get the per-trial record that lines are currently counted towards."""
+        return self.trials[-1] if self.trials else self.head
+
+    def add_line(self, line, next_line):
+        """
+        Count one line of the log.
+
+        Parameters:
+        line (str): The line.
+        next_line (callable): Returns the following line, or None at the end of the log.
+        """
+        if line == REWARD_LINE:
+            reward_line = next_line()
             if reward_line:
-                rewards.append(float(reward_line))
+                reward = float(reward_line)
+                self.total_rewards += reward
+                trial = self.current()
+                trial[1] += reward
+                if reward < 0:
+                    self.total_errors += reward
+                    trial[2] += reward
+        elif line == PASS_LINE:
+            self.passes += 1
+            self.current()[0] = 'pass'
+        elif line == FAIL_LINE:
+            self.fails += 1
+            self.current()[0] = 'fail'
+        elif line.startswith(ABORT_PREFIX):
+            self.current()[0] = 'fail'
+        elif line.startswith(TRIAL_PREFIX) and self.keep_trials:
+            self.trials.append([None, 0.0, 0.0])
+
+    def merge(self, other):
+        """
+        Append the statistics of the stretch of log that follows this one.
+
+        Parameters:
+        other (LogStats): Statistics of the following stretch.
+        """
+        self.passes += other.passes
+        self.fails += other.fails
+        self.total_rewards += other.total_rewards
+        self.total_errors += other.total_errors
+        if self.keep_trials:
+            # Lines before the other stretch's first trial marker continue our last trial
+            trial = self.current()
+            trial[0] = other.head[0] or trial[0]
+            trial[1] += other.head[1]
+            trial[2] += other.head[2]
+            self.trials.extend(other.trials)
+
+
+def analyze_chunk(path, encoding, start, end, data_start, keep_trials):
+    """
+    Analyze the lines of a log that start in [start, end).
+
+    Returns:
+    LogStats: Statistics of the chunk.
+    """
+    stats = LogStats(keep_trials)
+    lines = read_lines(path, encoding, start, end, data_start)
+    if start <= data_start:
+        next(lines, None)  # Skip the header row
+
+    def next_line():
+        line = next(lines, None)
+        return line[0] if line is not None else None
+
+    for line, inside in lines:
+        if not inside:
+            break
+        stats.add_line(line, next_line)
+    return stats
+
+
+def chunk_file(path, chunk_size):
+    """
+    Split a log into byte ranges that can be analyzed independently.
+
+    Returns:
+    list: (path, encoding, start, end, data_start) tuples covering the file.
+    """
+    encoding, data_start = detect_encoding(path)
+    size = os.path.getsize(path)
+    chunk_size = max(MIN_CHUNK_SIZE, chunk_size - chunk_size % 2)
+    bounds = list(range(data_start, size, chunk_size)) + [size]
+    return [(path, encoding, start, end, data_start) for start, end in zip(bounds[:-1], bounds[1:])] or [(path, encoding, data_start, size, data_start)]
+
+
+def analyze_logs(paths, jobs=None, chunk_size=64 << 20, keep_trials=False):
+    """
+    Analyze legacy logs, splitting large files into chunks across a process pool.
+
+    Parameters:
+    paths (list): Log files.
+    jobs (int): Number of worker processes (all cores if None, in-process if 1).
+    chunk_size (int): Bytes per chunk (at least MIN_CHUNK_SIZE).
+    keep_trials (bool): Whether to collect per-trial results.
+
+    Returns:
+    list: One LogStats per file, in the order given.
+    """
+    chunks = [chunk for path in paths for chunk in chunk_file(path, chunk_size)]
+    args = [chunk + (keep_trials,) for chunk in chunks]
+    if jobs == 1 or len(chunks) == 1:
+        results = [analyze_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(analyze_chunk, *zip(*args)))
+
+    per_file = {}
+    for chunk, stats in zip(chunks, results):
+        if chunk[0] in per_file:
+            per_file[chunk[0]].merge(stats)
+        else:
+            per_file[chunk[0]] = stats
+    return [per_file[path] for path in paths]
+
+
+def expand_paths(patterns):
+    """Expand glob patterns into a list of files, warning about patterns that match none."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+        if not matches:
+            sys.stderr.write("get_rewards.py: no log files match {}\n".format(pattern))
+        paths.extend(matches)
+    return paths
+
+
+def print_stats(stats, show_trials=False):
+    """Print the summary (and optionally the per-trial results) of a log."""
+    if show_trials:
+        trials = ([stats.head] if stats.head[0] is not None or stats.head[1] else []) + stats.trials
+        for i, (status, reward, errors) in enumerate(trials):
+            print("Trial {}: {}, reward = {}, errors = {}".format(i, (status or 'incomplete').upper(), reward, errors))
+    print("Your cab made {} successful trips, and {} late.".format(stats.passes, stats.fails))
+    print("It also had a total rewards of {} and a total error amount of {}".format(stats.total_rewards, stats.total_errors))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count passes, fails, rewards and errors in UTF-16 model_output.csv logs.")
+    parser.add_argument('paths', nargs='*', default=['model_output.csv'], help="log files or glob patterns")
+    parser.add_argument('--trials', action='store_true', help="also print per-trial results")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-mb', type=int, default=64, help="split files into chunks of this many MB")
+    args = parser.parse_args(argv)
 
-    # Calculate total rewards and errors
-    total_rewards = sum(rewards)
+    paths = expand_paths(args.paths)
+    if not paths:
+        parser.error("no log files to analyze")
+    results = analyze_logs(paths, jobs=args.jobs, chunk_size=args.chunk_mb << 20, keep_trials=args.trials)
+    for path, stats in zip(paths, results):
+        if len(paths) > 1:
+            print("{}:".format(path))
+        print_stats(stats, args.trials)
 
-    for reward in rewards:
-        if reward < 0:
-            errors.append(reward)
+    if len(paths) > 1:
+        total = LogStats()
+        for stats in results:
+            total.merge(stats)
+        print("Overall:")
+        print_stats(total)
 
-    total_errors = sum(errors)
 
-    # Print the results
-    print("Your cab made {} successful trips, and {} late.".format(passes, fails))
-    print("It also had a total rewards of {} and a total error amount of {}".format(total_rewards, total_errors))
+if __name__ == '__main__':
+    main(sys.argv[1:])
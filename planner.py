@@ -1,8 +1,99 @@
 import random
 
+import numpy as np
+
+from events import log
+
+# Waypoint tables shared by every planner and environment in the process
+_waypoint_arrays = {}  # (location, heading, destination) -> waypoint code arrays, keyed by grid size
+
+
+def compute_waypoint(location, heading, destination):
+    """
+    Compute the next waypoint from a location and heading towards a destination.
+
+    Parameters:
+    location (tuple): The current location (x, y).
+    heading (tuple): The current heading.
+    destination (tuple): The destination (x, y).
+
+    Returns:
+    str: The direction to take next ('forward', 'left', 'right', or None).
+    """
+    # Calculate the delta between the current location and the destination
+    delta = (destination[0] - location[0], destination[1] - location[1])
+
+    # Determine the next direction to take based on the delta
+    if delta[0] == 0 and delta[1] == 0:
+        return None  # Destination reached
+    elif delta[0] != 0:  # East-West difference
+        if delta[0] * heading[0] > 0:  # Facing correct East-West direction
+            return 'forward'
+        elif delta[0] * heading[0] < 0:  # Facing opposite East-West direction
+            return 'right'  # Long U-turn
+        elif delta[0] * heading[1] > 0:
+            return 'left'
+        else:
+            return 'right'
+    elif delta[1] != 0:  # North-South difference (turn logic is slightly different)
+        if delta[1] * heading[1] > 0:  # Facing correct North-South direction
+            return 'forward'
+        elif delta[1] * heading[1] < 0:  # Facing opposite North-South direction
+            return 'right'  # Long U-turn
+        elif delta[1] * heading[0] > 0:
+            return 'right'
+        else:
+            return 'left'
+
+
+def waypoint_array(grid_size):
+    """
+    Get the waypoint of every (location, heading, destination) triple as one shared array.
+
+    Locations and destinations are intersection indices as used by
+    environment.build_transition_table, headings index Environment.valid_headings and
+    waypoints are indices into Environment.valid_actions.
+
+    Parameters:
+    grid_size (tuple): Grid size as (cols, rows).
+
+    Returns:
+    ndarray: int8 array of shape (cols * rows, 4, cols * rows).
+    """
+    waypoints = _waypoint_arrays.get(grid_size)
+    if waypoints is not None:
+        return waypoints
+
+    from environment import Environment
+
+    cols, rows = grid_size
+    codes = {action: i for i, action in enumerate(Environment.valid_actions)}
+    # The waypoint only depends on the signs of the deltas and on the heading
+    by_sign = np.zeros((3, 3, 4), dtype=np.int8)
+    for sx in (-1, 0, 1):
+        for sy in (-1, 0, 1):
+            for h, heading in enumerate(Environment.valid_headings):
+                by_sign[sx + 1, sy + 1, h] = codes[compute_waypoint((0, 0), heading, (sx, sy))]
+
+    n = cols * rows
+    location = np.arange(n)
+    x, y = location // rows, location % rows
+    waypoints = np.empty((n, 4, n), dtype=np.int8)
+    block = 256  # Locations filled at a time, bounding the index temporaries to block * n
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        sign_x = np.sign(x[None, :] - x[start:stop, None]) + 1  # (location, destination)
+        sign_y = np.sign(y[None, :] - y[start:stop, None]) + 1
+        waypoints[start:stop] = by_sign[sign_x[:, None, :], sign_y[:, None, :], np.arange(4)[None, :, None]]
+    _waypoint_arrays[grid_size] = waypoints
+    return waypoints
+
+
 class RoutePlanner(object):
     """Silly route planner that is meant for a perpendicular grid network."""
 
+    max_table_intersections = 4096  # Larger grids compute waypoints directly instead of building tables
+
     def __init__(self, env, agent):
         """
         Initialize the RoutePlanner.
@@ -14,6 +105,7 @@ class RoutePlanner(object):
         self.env = env
         self.agent = agent
         self.destination = None
+        self._waypoints = None  # Waypoint of every (location, heading) pair for the current destination
 
     def route_to(self, destination=None):
         """
@@ -23,8 +115,13 @@ class RoutePlanner(object):
         destination (tuple): The destination coordinates (x, y). If None, choose a random destination.
         """
         # Choose a random destination if none is provided
-        self.destination = destination if destination is not None else random.choice(list(self.env.intersections.keys()))
-        print("RoutePlanner.route_to(): destination = {}".format(self.destination))  # [debug]
+        self.destination = destination if destination is not None else self.env.random_location()
+        self._waypoints = None
+        if len(self.env.intersections) <= self.max_table_intersections:
+            # One column of the shared waypoint array, as a list indexed by location * 4 + heading
+            codes = waypoint_array(self.env.grid_size)[:, :, self.env.intersections.index(self.destination)].ravel().tolist()
+            self._waypoints = list(map(self.env.valid_actions.__getitem__, codes))
+        log.debug('RoutePlanner.route_to', "RoutePlanner.route_to(): destination = {}", self.destination)
 
     def next_waypoint(self):
         """
@@ -33,31 +130,8 @@ class RoutePlanner(object):
         Returns:
         str: The direction the agent should take next ('forward', 'left', 'right', or None).
         """
-        # Get the agent's current location and heading
-        location = self.env.agent_states[self.agent]['location']
-        heading = self.env.agent_states[self.agent]['heading']
-        
-        # Calculate the delta between the current location and the destination
-        delta = (self.destination[0] - location[0], self.destination[1] - location[1])
-        
-        # Determine the next direction to take based on the delta
-        if delta[0] == 0 and delta[1] == 0:
-            return None  # Destination reached
-        elif delta[0] != 0:  # East-West difference
-            if delta[0] * heading[0] > 0:  # Facing correct East-West direction
-                return 'forward'
-            elif delta[0] * heading[0] < 0:  # Facing opposite East-West direction
-                return 'right'  # Long U-turn
-            elif delta[0] * heading[1] > 0:
-                return 'left'
-            else:
-                return 'right'
-        elif delta[1] != 0:  # North-South difference (turn logic is slightly different)
-            if delta[1] * heading[1] > 0:  # Facing correct North-South direction
-                return 'forward'
-            elif delta[1] * heading[1] < 0:  # Facing opposite North-South direction
-                return 'right'  # Long U-turn
-            elif delta[1] * heading[0] > 0:
-                return 'right'
-            else:
-                return 'left'
+        if self._waypoints is not None:
+            states = self.env.agent_states
+            return self._waypoints[states.location[self.agent.id] * 4 + states.heading[self.agent.id]]
+        state = self.env.agent_states[self.agent]
+        return compute_waypoint(state['location'], state['heading'], self.destination)
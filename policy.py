@@ -0,0 +1,130 @@
+import numpy as np
+
+from environment import Agent
+from planner import RoutePlanner
+from qtable import STATES, ACTIONS, table_arrays, encode_states
+
+
+class GreedyPolicy(object):
+    """A frozen greedy policy: one precomputed action per state, with ties already broken.
+
+    Acting is an array lookup, for one state or for a whole batch of encoded states.
+    """
+
+    def __init__(self, actions):
+        """
+        Initialize a GreedyPolicy.
+
+        Parameters:
+        actions (ndarray): Action id (index into ACTIONS) for each state id.
+        """
+        self.actions = np.asarray(actions, dtype=np.int8)
+        self.actions.flags.writeable = False
+        self._by_state = dict(zip(STATES, (ACTIONS[a] for a in self.actions.tolist())))  # State tuple -> action
+
+    @classmethod
+    def from_q(cls, q, seed=None):
+        """
+        Freeze the greedy actions of a Q-value array.
+
+        Parameters:
+        q (ndarray): (n_states, n_actions) Q-values indexed by state id and action id.
+        seed (int): Seed for breaking ties between equally valued actions, once per state.
+
+        Returns:
+        GreedyPolicy: The policy.
+        """
+        q = np.asarray(q)
+        rng = np.random.default_rng(seed)
+        ties = q == q.max(axis=1, keepdims=True)
+        return cls(np.argmax(np.where(ties, rng.random(q.shape), -1.0), axis=1))
+
+    @classmethod
+    def from_qtable(cls, table, seed=None):
+        """Freeze the greedy actions of an ArrayQTable or DictQTable (see from_q)."""
+        return cls.from_q(table_arrays(table)[0], seed)
+
+    @classmethod
+    def from_checkpoint(cls, path, seed=None):
+        """Freeze the greedy actions of a Q-table checkpoint (see checkpoint.py and from_q)."""
+        from checkpoint import load_checkpoint
+        return cls.from_q(load_checkpoint(path, mode='r')[0], seed)
+
+    def action(self, state):
+        """
+        Get the action for one state.
+
+        Parameters:
+        state (tuple): A (light, oncoming, left, waypoint) state.
+
+        Returns:
+        str: The action.
+        """
+        return self._by_state[state]
+
+    def act(self, states):
+        """
+        Get the actions for many encoded states at once.
+
+        Parameters:
+        states (ndarray): State ids (see qtable.encode_state and qtable.encode_states).
+
+        Returns:
+        ndarray: Action ids, indices into ACTIONS (the action codes of VecEnvironment).
+        """
+        return self.actions[states]
+
+    def act_observations(self, obs):
+        """
+        Get the actions for a batch of VecEnvironment observations.
+
+        Parameters:
+        obs (dict): Observation arrays as returned by VecEnvironment.sense.
+
+        Returns:
+        ndarray: Action codes, one per world.
+        """
+        return self.actions[encode_states(obs['light'], obs['oncoming'], obs['left'], obs['waypoint'])]
+
+
+class PolicyAgent(Agent):
+    """An inference-only agent that drives by a frozen policy and does not learn."""
+
+    def __init__(self, env, policy):
+        """
+        Initialize a PolicyAgent.
+
+        Parameters:
+        env (Environment): The environment instance the agent interacts with.
+        policy (GreedyPolicy): The policy to follow.
+        """
+        super(PolicyAgent, self).__init__(env)
+        self.color = 'red'
+        self.planner = RoutePlanner(self.env, self)
+        self.policy = policy
+        self.errors = 0
+        self.total_reward = 0
+
+    def reset(self, destination=None):
+        """
+        Reset the agent for a new trial.
+
+        Parameters:
+        destination (tuple): The destination to route to.
+        """
+        self.planner.route_to(destination)
+
+    def update(self, t):
+        """
+        Sense the environment and take the policy's action.
+
+        Parameters:
+        t (int): The current time step.
+        """
+        self.next_waypoint = self.planner.next_waypoint()
+        inputs = self.env.sense(self)
+        self.state = (inputs['light'], inputs['oncoming'], inputs['left'], self.next_waypoint)
+        reward = self.env.act(self, self.policy.action(self.state))
+        self.total_reward += reward
+        if reward < 0:
+            self.errors += reward
@@ -0,0 +1,227 @@
+import random
+import itertools
+
+import numpy as np
+
+from environment import Environment
+
+# Every (light, oncoming, left, waypoint) state a LearningAgent can observe
+STATES = tuple(itertools.product(('green', 'red'), Environment.valid_actions, Environment.valid_actions, Environment.valid_actions))
+STATE_IDS = {state: i for i, state in enumerate(STATES)}
+ACTIONS = tuple(Environment.valid_actions)  # Column order of the Q-value array
+ACTION_IDS = {action: i for i, action in enumerate(ACTIONS)}
+
+
+def encode_state(state):
+    """
+    Encode a (light, oncoming, left, waypoint) state as a small integer.
+
+    Parameters:
+    state (tuple): The state to encode.
+
+    Returns:
+    int: The state id, an index into STATES.
+    """
+    return STATE_IDS[state]
+
+
+def encode_states(light, oncoming, left, waypoint):
+    """
+    Encode many states at once from arrays of their parts.
+
+    Parameters:
+    light (ndarray): True where the light is green.
+    oncoming (ndarray): Action ids (indices into ACTIONS) of the oncoming cars.
+    left (ndarray): Action ids of the cars on the left.
+    waypoint (ndarray): Action ids of the next waypoints.
+
+    Returns:
+    ndarray: State ids, indices into STATES.
+    """
+    n = len(ACTIONS)
+    return ((1 - np.asarray(light, dtype=np.int64)) * n + oncoming) * n * n + np.asarray(left) * n + waypoint
+
+
+def table_arrays(table):
+    """
+    Get the Q-values and visit counts of a Q-table as (n_states, n_actions) arrays.
+
+    Parameters:
+    table (ArrayQTable or DictQTable): The Q-table.
+
+    Returns:
+    tuple: (q, visits) arrays indexed by state id and action id.
+    """
+    if isinstance(table, ArrayQTable):
+        return table.q, table.visits
+    q = np.zeros((len(STATES), len(ACTIONS)))
+    visits = np.zeros((len(STATES), len(ACTIONS)), dtype=np.int64)
+    for i, state in enumerate(STATES):
+        for j, action in enumerate(ACTIONS):
+            q[i, j] = table[(state, action)]
+            visits[i, j] = table.visits.get((state, action), 0)
+    return q, visits
+
+
+class DictQTable(object):
+    """Q-table stored in a dict keyed by (state, action); unseen pairs have a value of 0."""
+
+    def __init__(self, actions=(None, 'left', 'forward', 'right'), rng=random):
+        """
+        Initialize a DictQTable.
+
+        Parameters:
+        actions (tuple): The actions to choose from, in tie-breaking order.
+        rng (Random): Random number generator used for tie-breaking.
+        """
+        self.actions = actions
+        self.rng = rng
+        self.qs = {}
+        self.visits = {}  # Updates applied to each (state, action) pair
+
+    def __getitem__(self, key):
+        return self.qs.get(key, 0)
+
+    def __len__(self):
+        return len(self.qs)
+
+    def best_action(self, state):
+        """
+        Pick the action with the highest Q-value in a state, breaking ties at random.
+
+        Parameters:
+        state (tuple): The state to act in.
+
+        Returns:
+        tuple: (action, its Q-value).
+        """
+        all_qs = {action: self.qs.get((state, action), 0) for action in self.actions}
+        best = max(all_qs.values())
+        optimal_actions = [action for action in self.actions if all_qs[action] == best]
+        return self.rng.choice(optimal_actions), float(best)
+
+    def update(self, state, action, target, alpha):
+        """
+        Move the Q-value of a (state, action) pair towards a target.
+
+        Parameters:
+        state (tuple): The state the action was taken in.
+        action (str): The action taken.
+        target (float): The new estimate (reward plus discounted future value).
+        alpha (float): The learning rate.
+        """
+        self.qs[(state, action)] = (1 - alpha) * self.qs.get((state, action), 0) + alpha * target
+        self.visits[(state, action)] = self.visits.get((state, action), 0) + 1
+
+
+class ArrayQTable(object):
+    """Q-table stored as a dense (n_states, n_actions) float array indexed by state id.
+
+    The greedy actions of each state are cached and recomputed only after that state's
+    row changes, so single-step selection stays cheap while the array remains available
+    for batched operations.
+    """
+
+    def __init__(self, rng=random):
+        """
+        Initialize an ArrayQTable with every Q-value at 0.
+
+        Parameters:
+        rng (Random): Random number generator used for tie-breaking.
+        """
+        self.actions = ACTIONS
+        self.rng = rng
+        self.q = np.zeros((len(STATES), len(ACTIONS)))
+        self.visits = np.zeros((len(STATES), len(ACTIONS)), dtype=np.int64)  # Updates applied to each Q-value
+        self._greedy = [None] * len(STATES)  # Cached (optimal actions, optimal value) per state
+
+    def __getitem__(self, key):
+        state, action = key
+        return self.q.item(STATE_IDS[state], ACTION_IDS[action])
+
+    def __len__(self):
+        return int(np.count_nonzero(self.q))
+
+    def best_action(self, state):
+        """
+        Pick the action with the highest Q-value in a state, breaking ties at random.
+
+        Parameters:
+        state (tuple): The state to act in.
+
+        Returns:
+        tuple: (action, its Q-value).
+        """
+        state_id = STATE_IDS[state]
+        greedy = self._greedy[state_id]
+        if greedy is None:
+            row = self.q[state_id].tolist()
+            best = max(row)
+            greedy = self._greedy[state_id] = ([ACTIONS[i] for i, value in enumerate(row) if value == best], best)
+        optimal_actions, best = greedy
+        return (self.rng.choice(optimal_actions) if len(optimal_actions) > 1 else optimal_actions[0]), best
+
+    def best_actions(self, state_ids, rng=None):
+        """
+        Pick greedy actions for many states at once, breaking ties at random.
+
+        Parameters:
+        state_ids (ndarray): Encoded states.
+        rng (Generator): NumPy random generator used for tie-breaking.
+
+        Returns:
+        ndarray: Action ids (indices into ACTIONS), one per state.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        rows = self.q[state_ids]
+        ties = rows == rows.max(axis=1, keepdims=True)
+        return np.argmax(np.where(ties, rng.random(rows.shape), -1.0), axis=1)
+
+    def update(self, state, action, target, alpha):
+        """
+        Move the Q-value of a (state, action) pair towards a target.
+
+        Parameters:
+        state (tuple): The state the action was taken in.
+        action (str): The action taken.
+        target (float): The new estimate (reward plus discounted future value).
+        alpha (float): The learning rate.
+        """
+        state_id = STATE_IDS[state]
+        i = state_id, ACTION_IDS[action]
+        self.q[i] += alpha * (target - self.q.item(i))
+        self.visits[i] += 1
+        self._greedy[state_id] = None
+
+    def update_batch(self, state_ids, action_ids, targets, alpha):
+        """
+        Move many Q-values towards their targets at once.
+
+        A (state, action) pair that appears several times in the batch takes one step, towards
+        the mean of its targets, so duplicates do not multiply the learning rate.
+
+        Parameters:
+        state_ids (ndarray): Encoded states.
+        action_ids (ndarray): Action ids (indices into ACTIONS).
+        targets (ndarray): The new estimates.
+        alpha (float): The learning rate.
+        """
+        n_actions = len(ACTIONS)
+        pairs = np.asarray(state_ids, dtype=np.int64) * n_actions + action_ids
+        unique, inverse = np.unique(pairs, return_inverse=True)
+        sums = np.zeros(len(unique))
+        counts = np.zeros(len(unique), dtype=np.int64)
+        np.add.at(sums, inverse, targets)
+        np.add.at(counts, inverse, 1)
+        i = np.divmod(unique, n_actions)
+        self.q[i] += alpha * (sums / counts - self.q[i])
+        self.visits[i] += counts
+        for state_id in np.unique(i[0]).tolist():
+            self._greedy[state_id] = None
+
+    def invalidate(self):
+        """Forget cached greedy actions after the Q-value array was modified directly."""
+        self._greedy = [None] * len(STATES)
+
+
+qtable_backends = {'dict': DictQTable, 'array': ArrayQTable}
@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+
+from qtable import STATE_IDS
+from environment import Environment
+
+# Fixed-width little-endian records; files hold nothing but back-to-back records
+STEP_DTYPE = np.dtype([('trial', '<u4'), ('t', '<u4'), ('state', 'u1'), ('action', 'u1'), ('reward', '<f4'), ('deadline', '<i4')])
+TRIAL_DTYPE = np.dtype([('trial', '<u4'), ('success', 'u1'), ('steps', '<u4'), ('total_reward', '<f4'), ('errors', '<f4')])
+UNKNOWN_STATE = 255  # State id recorded when the primary agent's state is not a (light, oncoming, left, waypoint) tuple
+
+
+def trace_paths(path):
+    """
+    Get the files a trace is stored in.
+
+    Parameters:
+    path (str): Trace path prefix.
+
+    Returns:
+    tuple: (per-step file, per-trial file).
+    """
+    return path + '.steps', path + '.trials'
+
+
+def load_trace(path, mmap=True):
+    """
+    Load a trace written by TraceRecorder.
+
+    Parameters:
+    path (str): Trace path prefix.
+    mmap (bool): Whether to memory-map the files instead of reading them into memory.
+
+    Returns:
+    tuple: (steps, trials) structured arrays with STEP_DTYPE and TRIAL_DTYPE records.
+    """
+    arrays = []
+    for file_path, dtype in zip(trace_paths(path), (STEP_DTYPE, TRIAL_DTYPE)):
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            arrays.append(np.zeros(0, dtype=dtype))
+        elif mmap:
+            arrays.append(np.memmap(file_path, dtype=dtype, mode='r'))
+        else:
+            arrays.append(np.fromfile(file_path, dtype=dtype))
+    return tuple(arrays)
+
+
+class TraceRecorder(object):
+    """Append-only binary recorder of the primary agent's steps and per-trial summaries.
+
+    Records are buffered in preallocated arrays and appended to the trace files when the
+    buffer fills or the recorder is flushed, so traces can be memory-mapped with NumPy
+    (see load_trace) instead of parsed from text.
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        """
+        Initialize a TraceRecorder.
+
+        Parameters:
+        path (str): Trace path prefix; records are appended to path.steps and path.trials.
+        buffer_size (int): Number of step records buffered before writing.
+        """
+        self.path = path
+        self.steps_path, self.trials_path = trace_paths(path)
+        self.steps = np.zeros(buffer_size, dtype=STEP_DTYPE)
+        self.n_steps = 0  # Buffered step records
+        self.trials = []  # Buffered trial records
+        self.action_ids = Environment.action_ids
+
+        self.trial = 0  # Number of the trial being recorded, as given by the environment
+        self.trial_steps = 0
+        self.trial_reward = 0.0
+        self.trial_errors = 0.0
+
+    def begin_trial(self, trial):
+        """
+        Start recording a new trial.
+
+        Parameters:
+        trial (int): The environment's number for the trial (Environment.trial), so appended
+            runs and replays of single trials are recorded under the trials they really are.
+        """
+        self.trial = trial
+        self.trial_steps = 0
+        self.trial_reward = 0.0
+        self.trial_errors = 0.0
+
+    def record_step(self, t, state, action, reward, deadline):
+        """
+        Record one action of the primary agent.
+
+        Parameters:
+        t (int): Time step.
+        state (tuple): The agent's (light, oncoming, left, waypoint) state.
+        action (str): The action taken.
+        reward (float): The reward received.
+        deadline (int): The deadline when acting.
+        """
+        if self.n_steps == len(self.steps):
+            self._write_steps()
+        self.steps[self.n_steps] = (self.trial, t, STATE_IDS.get(state, UNKNOWN_STATE), self.action_ids[action], reward, deadline)
+        self.n_steps += 1
+        self.trial_steps += 1
+        self.trial_reward += reward
+        if reward < 0:
+            self.trial_errors += reward
+
+    def end_trial(self, success):
+        """
+        Record the summary of the current trial.
+
+        Parameters:
+        success (bool): Whether the primary agent reached its destination.
+        """
+        self.trials.append((self.trial, success, self.trial_steps, self.trial_reward, self.trial_errors))
+
+    def flush(self):
+        """Append all buffered records to the trace files."""
+        self._write_steps()
+        if self.trials:
+            with open(self.trials_path, 'ab') as f:
+                np.array(self.trials, dtype=TRIAL_DTYPE).tofile(f)
+            self.trials = []
+
+    def _write_steps(self):
+        """Append the buffered step records to the steps file."""
+        if self.n_steps:
+            with open(self.steps_path, 'ab') as f:
+                self.steps[:self.n_steps].tofile(f)
+            self.n_steps = 0
@@ -0,0 +1,193 @@
+import numpy as np
+
+from environment import Environment
+
+
+class Renderer(object):
+    """Draws an Environment onto a PyGame surface, redrawing only what changed.
+
+    The road network is drawn once to a background surface. Traffic lights are drawn onto
+    a copy of it (the light layer), and only the lights that toggled are redrawn. Each frame
+    restores the areas the cars and text covered last frame from the light layer, draws
+    the cars from pre-rotated sprites and cached text glyphs, and pushes only those dirty
+    rectangles to the display. Apart from one vectorized comparison of the light states, a
+    frame therefore costs about the same however large the grid is.
+    """
+
+    max_glyphs = 512  # Cached text surfaces; status lines vary, so the cache is cleared when full
+
+    def __init__(self, pygame, screen, env, font, colors, bg_color, road_color, road_width=5, agent_circle_radius=10, present=True):
+        """
+        Initialize a Renderer.
+
+        Parameters:
+        pygame (module): The pygame module.
+        screen (Surface): Surface to draw on (the display surface, or an offscreen one).
+        env (Environment): The environment to draw.
+        font (Font): Font for waypoint labels and status text.
+        colors (dict): Color names to RGB tuples.
+        bg_color (tuple): Background color.
+        road_color (tuple): Road and intersection color.
+        road_width (int): Width of roads and light bars in pixels.
+        agent_circle_radius (int): Radius of cars drawn without a sprite.
+        present (bool): Push frames to the display; False when drawing to an offscreen surface.
+        """
+        self.pygame = pygame
+        self.screen = screen
+        self.env = env
+        self.font = font
+        self.colors = colors
+        self.bg_color = bg_color
+        self.road_color = road_color
+        self.road_width = road_width
+        self.agent_circle_radius = agent_circle_radius
+        self.present = present
+
+        self.background = None  # Roads and intersections
+        self.layer = None  # Background plus traffic lights
+        self.light_states = None  # Light states drawn on the layer
+        self.light_tiles = {}  # (state, roads leaving the intersection) -> intersection tile with its light drawn
+        self.sprites = {}  # (color, heading index) -> rotated sprite
+        self.glyphs = {}  # (text, color) -> rendered text surface
+        self.previous = []  # Rectangles covered by cars and text in the last frame
+
+    def build_background(self):
+        """Draw the static road network to the background surface and start the light layer from it."""
+        pygame = self.pygame
+        block = self.env.block_size
+        self.background = pygame.Surface(self.screen.get_size())
+        self.background.fill(self.bg_color)
+        for road in self.env.roads:
+            pygame.draw.line(self.background, self.road_color, (road[0][0] * block, road[0][1] * block), (road[1][0] * block, road[1][1] * block), self.road_width)
+        for intersection in self.env.intersections:
+            pygame.draw.circle(self.background, self.road_color, (intersection[0] * block, intersection[1] * block), 10)
+        self.layer = self.background.copy()
+        self.light_states = None
+        self.light_tiles = {}
+
+    def light_rect(self, index):
+        """Area of the light layer covered by a light's bar, whichever direction it is in."""
+        x, y = self.env.intersections.location(index)
+        block = self.env.block_size
+        half = 15 + self.road_width
+        return self.pygame.Rect(x * block - half, y * block - half, 2 * half + 1, 2 * half + 1)
+
+    def light_tile(self, index, rect, ns_open):
+        """
+        Get the image of an intersection with its light in a given state.
+
+        Intersections look alike apart from which roads leave them, so one tile per
+        (state, roads) combination is drawn and reused across the grid.
+        """
+        x, y = self.env.intersections.location(index)
+        min_x, min_y, max_x, max_y = self.env.intersections.bounds
+        key = (ns_open, x > min_x, x < max_x, y > min_y, y < max_y)
+        tile = self.light_tiles.get(key)
+        if tile is None:
+            tile = self.light_tiles[key] = self.background.subsurface(rect.clip(self.background.get_rect())).copy()
+            center = (x * self.env.block_size - rect.x, y * self.env.block_size - rect.y)
+            if ns_open:
+                self.pygame.draw.line(tile, self.colors['green'], (center[0], center[1] - 15), (center[0], center[1] + 15), self.road_width)
+            else:
+                self.pygame.draw.line(tile, self.colors['green'], (center[0] - 15, center[1]), (center[0] + 15, center[1]), self.road_width)
+        return tile
+
+    def update_lights(self):
+        """
+        Redraw the lights that toggled since the last frame on the light layer.
+
+        Returns:
+        list: Rectangles of the layer that changed.
+        """
+        states = self.env.lights.states()
+        if self.light_states is None:
+            changed = range(len(states))
+        else:
+            changed = np.flatnonzero(self.light_states != states).tolist()
+        self.light_states = states
+
+        rects = []
+        for i in changed:
+            rect = self.light_rect(i)
+            rects.append(self.layer.blit(self.light_tile(i, rect, bool(states[i])), rect))
+        return rects
+
+    def sprite(self, agent, heading):
+        """Get an agent's sprite rotated to a heading index, rotating each (color, heading) only once."""
+        key = (agent.color, heading)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            dx, dy = Environment.valid_headings[heading]
+            angle = 0 if (dx, dy) == (1, 0) else (180 if dx == -1 else dy * -90)
+            sprite = self.sprites[key] = self.pygame.transform.rotate(agent._sprite, angle) if angle else agent._sprite
+        return sprite
+
+    def glyph(self, text, color):
+        """Get the rendered surface of a piece of text, rendering each (text, color) only once."""
+        key = (text, color)
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            if len(self.glyphs) >= self.max_glyphs:
+                self.glyphs.clear()
+            glyph = self.glyphs[key] = self.font.render(text, True, color, self.bg_color)
+        return glyph
+
+    def draw(self, full=False):
+        """
+        Draw a frame and push it to the display (if presenting).
+
+        Parameters:
+        full (bool): Redraw and push the whole screen instead of only the dirty rectangles.
+        """
+        pygame = self.pygame
+        screen = self.screen
+        if self.background is None:
+            self.build_background()
+            full = True
+
+        dirty = self.update_lights()
+        if full:
+            screen.blit(self.layer, (0, 0))
+        else:
+            for rect in dirty + self.previous:
+                screen.blit(self.layer, rect, rect)
+            dirty.extend(self.previous)
+
+        current = []
+        block = self.env.block_size
+        radius = self.agent_circle_radius
+        states = self.env.agent_states
+        for agent in states.agents:
+            i = agent.id
+            heading = states.heading[i]
+            dx, dy = Environment.valid_headings[heading]
+            x, y = states.intersections.location(states.location[i])
+            agent_pos = (x * block - 2 * dx * radius, y * block - 2 * dy * radius)
+            agent_color = self.colors[agent.color]
+            if getattr(agent, '_sprite', None) is not None:
+                sprite = self.sprite(agent, heading)
+                current.append(screen.blit(sprite, sprite.get_rect(center=agent_pos)))
+            else:
+                current.append(pygame.draw.circle(screen, agent_color, agent_pos, radius))
+                current.append(pygame.draw.line(screen, agent_color, agent_pos, (x, y), self.road_width))
+            waypoint = agent.get_next_waypoint()
+            if waypoint is not None:
+                current.append(screen.blit(self.glyph(waypoint, agent_color), (agent_pos[0] + 10, agent_pos[1] + 10)))
+            destination = states.destination[i]
+            if destination >= 0:
+                dest_x, dest_y = states.intersections.location(destination)
+                pygame.draw.circle(screen, agent_color, (dest_x * block, dest_y * block), 6)
+                current.append(pygame.draw.circle(screen, agent_color, (dest_x * block, dest_y * block), 15, 2))
+
+        text_y = 10
+        for text in self.env.status_text.split('\n'):
+            current.append(screen.blit(self.glyph(text, self.colors['red']), (100, text_y)))
+            text_y += 20
+
+        self.previous = current
+        if not self.present:
+            return
+        if full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty + current)
@@ -0,0 +1,109 @@
+import numpy as np
+
+# Eviction policies once the buffer is full
+FIFO = 'fifo'  # Overwrite the oldest transition
+RANDOM = 'random'  # Overwrite a transition chosen uniformly at random
+evictions = (FIFO, RANDOM)
+
+
+class ReplayBuffer(object):
+    """Fixed-size experience replay buffer of (state, action, reward, next state, done) transitions.
+
+    Transitions are stored as encoded state and action ids in preallocated NumPy arrays,
+    so adding never allocates and sampling returns arrays ready for batched Q updates.
+    """
+
+    def __init__(self, capacity, eviction=FIFO, rng=None):
+        """
+        Initialize an empty ReplayBuffer.
+
+        Parameters:
+        capacity (int): Maximum number of transitions kept.
+        eviction (str): What to overwrite once full, 'fifo' or 'random'.
+        rng (Generator): NumPy random generator for sampling and random eviction.
+        """
+        if eviction not in evictions:
+            raise ValueError("Unknown eviction policy {!r}; expected one of {}".format(eviction, ', '.join(evictions)))
+        self.capacity = capacity
+        self.eviction = eviction
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.states = np.zeros(capacity, dtype=np.int16)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int16)
+        self.dones = np.zeros(capacity, dtype=bool)  # True where the transition ended the trial at its destination
+        self.size = 0  # Transitions currently stored
+        self.next = 0  # Slot the next FIFO write goes to once full
+        self.added = 0  # Transitions added in total
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done=False):
+        """
+        Add one transition.
+
+        Parameters:
+        state (int): State id.
+        action (int): Action id.
+        reward (float): Reward received.
+        next_state (int): State id observed next.
+        done (bool): Whether the transition reached the destination; its next state is then not bootstrapped from.
+        """
+        if self.size < self.capacity:
+            i = self.size
+            self.size += 1
+        elif self.eviction == FIFO:
+            i = self.next
+            self.next = (i + 1) % self.capacity
+        else:
+            i = int(self.rng.integers(self.capacity))
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.added += 1
+
+    def add_batch(self, states, actions, rewards, next_states, dones=False):
+        """
+        Add many transitions at once (see add).
+
+        Parameters:
+        states (ndarray): State ids.
+        actions (ndarray): Action ids.
+        rewards (ndarray): Rewards.
+        next_states (ndarray): Next state ids.
+        dones (ndarray or bool): Which transitions reached the destination.
+        """
+        n = len(states)
+        free = min(self.capacity - self.size, n)
+        slots = np.arange(self.size, self.size + free)
+        if free < n:
+            if self.eviction == FIFO:
+                evicted = (self.next + np.arange(n - free)) % self.capacity
+                self.next = (self.next + n - free) % self.capacity
+            else:
+                evicted = self.rng.integers(self.capacity, size=n - free)
+            slots = np.concatenate([slots, evicted])
+        self.size += free
+        # A batch larger than the buffer overwrites its own older transitions
+        self.states[slots] = states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = next_states
+        self.dones[slots] = dones
+        self.added += n
+
+    def sample(self, batch_size):
+        """
+        Sample transitions uniformly with replacement.
+
+        Parameters:
+        batch_size (int): Number of transitions.
+
+        Returns:
+        tuple: (states, actions, rewards, next_states, dones) arrays.
+        """
+        i = self.rng.integers(self.size, size=batch_size)
+        return self.states[i], self.actions[i], self.rewards[i], self.next_states[i], self.dones[i]
@@ -0,0 +1,71 @@
+import time
+
+
+class FrameScheduler(object):
+    """Paces simulation steps and display frames at independent rates.
+
+    Steps are due every step_interval seconds and frames every frame_interval seconds,
+    each on its own fixed timeline. A step that falls behind is caught up on straight
+    away, so the simulation keeps its pace; a frame that falls behind is dropped and the
+    next one is due on the frame timeline, so a slow display never slows the simulation.
+    Between deadlines the caller sleeps instead of polling the clock.
+    """
+
+    def __init__(self, step_interval, frame_interval, clock=time.perf_counter, sleep=time.sleep):
+        """
+        Initialize a FrameScheduler.
+
+        Parameters:
+        step_interval (float): Seconds between simulation steps (0: step as fast as possible).
+        frame_interval (float): Seconds between frames.
+        clock (callable): Returns the current time in seconds.
+        sleep (callable): Sleeps for a number of seconds.
+        """
+        self.step_interval = max(step_interval, 0.0)
+        self.frame_interval = max(frame_interval, 1e-3)
+        self.clock = clock
+        self.sleep = sleep
+        self.start()
+
+    def start(self):
+        """Make a step and a frame due now, and clear the counters."""
+        now = self.clock()
+        self.next_step = now
+        self.next_frame = now
+        self.steps = 0  # Steps taken
+        self.frames = 0  # Frames drawn
+        self.frames_skipped = 0  # Frames dropped because the display fell behind
+
+    def step_due(self):
+        """Check whether a simulation step is due."""
+        return self.clock() >= self.next_step
+
+    def frame_due(self):
+        """Check whether a frame is due."""
+        return self.clock() >= self.next_frame
+
+    def stepped(self):
+        """Record a step, making the next one due a step interval after this one was."""
+        self.steps += 1
+        self.next_step += self.step_interval
+
+    def drawn(self):
+        """Record a frame, making the next one due on the frame timeline and dropping any that were missed."""
+        self.frames += 1
+        self.next_frame += self.frame_interval
+        now = self.clock()
+        if self.next_frame <= now:
+            missed = int((now - self.next_frame) // self.frame_interval) + 1
+            self.frames_skipped += missed
+            self.next_frame += missed * self.frame_interval
+
+    def shift(self, seconds):
+        """Push both deadlines back, e.g. by the time the simulation was paused."""
+        self.next_step += seconds
+        self.next_frame += seconds
+
+    def wait(self):
+        """Sleep until the next step or frame is due."""
+        delay = min(self.next_step, self.next_frame) - self.clock()
+        if delay > 0:
+            self.sleep(delay)
@@ -1,8 +1,31 @@
 import os
 import time
-import random
 import importlib
 
+from events import log
+from scheduler import FrameScheduler
+
+sprite_cache = {}  # (image file, size) -> scaled sprite, shared by every agent and simulator in the process
+
+
+def load_sprite(pygame, color, size):
+    """
+    Load and scale the sprite of a car color, once per process.
+
+    Parameters:
+    pygame (module): The pygame module.
+    color (str): The car color, naming images/car-<color>.png.
+    size (tuple): Sprite size in pixels.
+
+    Returns:
+    Surface: The sprite; callers share it and must not draw on it.
+    """
+    key = (os.path.abspath(os.path.join("images", "car-{}.png".format(color))), size)
+    sprite = sprite_cache.get(key)
+    if sprite is None:
+        sprite = sprite_cache[key] = pygame.transform.smoothscale(pygame.image.load(key[0]), size)
+    return sprite
+
 class Simulator(object):
     """Simulates agents in a dynamic smartcab environment.
 
@@ -21,7 +44,8 @@ class Simulator(object):
         'orange': (255, 128, 0)
     }
 
-    def __init__(self, env, size=None, update_delay=1.0, display=True):
+    def __init__(self, env, size=None, update_delay=1.0, display=True, trace=None, checkpoint=None, checkpoint_every=100, frame_rate=30,
+                 record=None, record_trials=None, record_every=1, record_fps=10):
         """
         Initialize the Simulator.
 
@@ -30,8 +54,23 @@ class Simulator(object):
         size (tuple): The size of the window.
         update_delay (float): Time delay between updates in seconds.
         display (bool): Whether to display the simulation using PyGame.
+        trace (str): Path prefix of a binary trace to append steps and trial summaries to (see recorder.py).
+        checkpoint (str): File to save the primary agent's Q-table to (see checkpoint.py).
+        checkpoint_every (int): Number of trials between checkpoints; one is also saved when a run ends.
+        frame_rate (float): Target frames per second of the display, independent of update_delay.
+        record (str): Video file to record trials to, e.g. 'videos/trial-{trial}.mp4' ({trial} is replaced
+            by the trial number; see video.FrameEncoder). Without a display, frames are rendered offscreen.
+        record_trials (iterable): Numbers of the trials to record (all if None).
+        record_every (int): Steps between recorded frames of a run without a display.
+        record_fps (float): Frame rate of the recorded video.
         """
         self.env = env
+        if trace is not None:
+            from recorder import TraceRecorder
+            self.env.recorder = TraceRecorder(trace)
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.trials_since_checkpoint = 0
         self.size = size if size is not None else ((self.env.grid_size[0] + 1) * self.env.block_size, (self.env.grid_size[1] + 1) * self.env.block_size)
         self.width, self.height = self.size
 
@@ -40,148 +79,264 @@ class Simulator(object):
         self.road_color = self.colors['black']
 
         self.quit = False
-        self.start_time = None
-        self.current_time = 0.0
-        self.last_updated = 0.0
+        self.stats = None  # Statistics of the last headless run
         self.update_delay = update_delay
+        self.frame_rate = frame_rate
+        self.scheduler = None  # Paces steps and frames of the displayed run
+
+        self.record = record
+        self.record_trials = set(record_trials) if record_trials is not None else None
+        self.record_every = record_every
+        self.record_fps = record_fps
+        self.encoders = []  # Encoders of this run's recorded trials, possibly still writing
 
         self.display = display
-        if self.display:
+        if self.display or self.record:
             try:
+                if not self.display:
+                    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Render offscreen, e.g. on a machine with no display
                 self.pygame = importlib.import_module('pygame')
                 self.pygame.init()
-                self.screen = self.pygame.display.set_mode(self.size)
+                self.screen = self.pygame.display.set_mode(self.size) if self.display else self.pygame.Surface(self.size)
 
-                self.frame_delay = max(1, int(self.update_delay * 1000))  # delay between GUI frames in ms (min: 1)
                 self.agent_sprite_size = (32, 32)
                 self.agent_circle_radius = 10  # radius of circle, when using simple representation
                 for agent in self.env.agent_states:
-                    agent._sprite = self.pygame.transform.smoothscale(self.pygame.image.load(os.path.join("images", "car-{}.png".format(agent.color))), self.agent_sprite_size)
+                    agent._sprite = load_sprite(self.pygame, agent.color, self.agent_sprite_size)
                     agent._sprite_size = (agent._sprite.get_width(), agent._sprite.get_height())
 
                 self.font = self.pygame.font.Font(None, 28)
                 self.paused = False
+
+                from renderer import Renderer
+                self.renderer = Renderer(self.pygame, self.screen, self.env, self.font, self.colors, self.bg_color, self.road_color, self.road_width, self.agent_circle_radius,
+                                         present=self.display)
             except ImportError as e:
                 self.display = False
-                print("Simulator.__init__(): Unable to import pygame; display disabled.\n{}: {}".format(e.__class__.__name__, e))
+                self.record = None
+                log.warning('Simulator.__init__', "Simulator.__init__(): Unable to import pygame; display and recording disabled.\n{}: {}", e.__class__.__name__, e)
             except Exception as e:
                 self.display = False
-                print("Simulator.__init__(): Error initializing GUI objects; display disabled.\n{}: {}".format(e.__class__.__name__, e))
+                self.record = None
+                log.warning('Simulator.__init__', "Simulator.__init__(): Error initializing GUI objects; display and recording disabled.\n{}: {}", e.__class__.__name__, e)
 
-    def run(self, n_trials=1):
+    def run(self, n_trials=1, first_trial=None):
         """
         Run the simulation for a specified number of trials.
 
         Parameters:
         n_trials (int): Number of trials to run.
+        first_trial (int): Number of the first trial; by default the one after the environment's
+            current trial. With a seeded environment, run(1, first_trial=k) replays trial k of a
+            run without running the trials before it.
         """
+        if not self.display:
+            return self.run_headless(n_trials, first_trial=first_trial)
+
         self.quit = False
-        for trial in range(n_trials):
-            print("Simulator.run(): Trial {}".format(trial))  # [debug]
-            self.env.reset()
-            self.current_time = 0.0
-            self.last_updated = 0.0
-            self.start_time = time.time()
+        scheduler = self.scheduler = FrameScheduler(self.update_delay, 1.0 / self.frame_rate)
+        first_trial = self.env.trial + 1 if first_trial is None else first_trial
+        for trial in range(first_trial, first_trial + n_trials):
+            log.info('Simulator.run', "Simulator.run(): Trial {}", trial)
+            self.env.reset(trial=trial)
+            self.begin_trial()
+            encoder = self.start_recording(trial)
+            scheduler.start()
             while True:
                 try:
-                    # Update current time
-                    self.current_time = time.time() - self.start_time
-
                     # Handle GUI events
-                    if self.display:
-                        for event in self.pygame.event.get():
-                            if event.type == self.pygame.QUIT:
+                    for event in self.pygame.event.get():
+                        if event.type == self.pygame.QUIT:
+                            self.quit = True
+                        elif event.type == self.pygame.KEYDOWN:
+                            if event.key == 27:  # Esc
                                 self.quit = True
-                            elif event.type == self.pygame.KEYDOWN:
-                                if event.key == 27:  # Esc
-                                    self.quit = True
-                                elif event.unicode == ' ':
-                                    self.paused = True
+                            elif event.unicode == ' ':
+                                self.paused = True
 
-                        if self.paused:
-                            self.pause()
+                    if self.paused:
+                        scheduler.shift(self.pause())
 
-                    # Update environment
-                    if self.current_time - self.last_updated >= self.update_delay:
+                    # Take the steps that are due, stopping to draw when a frame is due too
+                    while not self.quit and not self.env.done and scheduler.step_due():
                         self.env.step()
-                        self.last_updated = self.current_time
+                        scheduler.stepped()
+                        if scheduler.frame_due():
+                            break
 
-                    # Render GUI and sleep
-                    if self.display:
+                    # Draw a frame if one is due (frames missed while stepping are dropped), then sleep
+                    if scheduler.frame_due() or self.env.done:
                         self.render()
-                        self.pygame.time.wait(self.frame_delay)
+                        scheduler.drawn()
+                        if encoder is not None:
+                            encoder.submit(self.frame())
+                    if not (self.quit or self.env.done):
+                        scheduler.wait()
                 except KeyboardInterrupt:
                     self.quit = True
                 finally:
                     if self.quit or self.env.done:
                         break
 
+            log.debug('Simulator.run', "Simulator.run(): {} steps, {} frames drawn, {} frames skipped",
+                      scheduler.steps, scheduler.frames, scheduler.frames_skipped)
+            self.end_trial(encoder)
             if self.quit:
                 break
+        self.flush_trace()
 
-    def render(self):
-        """Render the simulation environment using PyGame."""
-        # Clear screen
-        self.screen.fill(self.bg_color)
-
-        # Draw elements
-        # * Static elements
-        for road in self.env.roads:
-            self.pygame.draw.line(self.screen, self.road_color, (road[0][0] * self.env.block_size, road[0][1] * self.env.block_size), (road[1][0] * self.env.block_size, road[1][1] * self.env.block_size), self.road_width)
-
-        for intersection, traffic_light in self.env.intersections.items():
-            self.pygame.draw.circle(self.screen, self.road_color, (intersection[0] * self.env.block_size, intersection[1] * self.env.block_size), 10)
-            if traffic_light.state:  # North-South is open
-                self.pygame.draw.line(self.screen, self.colors['green'],
-                    (intersection[0] * self.env.block_size, intersection[1] * self.env.block_size - 15),
-                    (intersection[0] * self.env.block_size, intersection[1] * self.env.block_size + 15), self.road_width)
-            else:  # East-West is open
-                self.pygame.draw.line(self.screen, self.colors['green'],
-                    (intersection[0] * self.env.block_size - 15, intersection[1] * self.env.block_size),
-                    (intersection[0] * self.env.block_size + 15, intersection[1] * self.env.block_size), self.road_width)
-
-        # * Dynamic elements
-        for agent, state in self.env.agent_states.items():
-            # Compute precise agent location here (back from the intersection some)
-            agent_offset = (2 * state['heading'][0] * self.agent_circle_radius, 2 * state['heading'][1] * self.agent_circle_radius)
-            agent_pos = (state['location'][0] * self.env.block_size - agent_offset[0], state['location'][1] * self.env.block_size - agent_offset[1])
-            agent_color = self.colors[agent.color]
-            if hasattr(agent, '_sprite') and agent._sprite is not None:
-                # Draw agent sprite (image), properly rotated
-                rotated_sprite = agent._sprite if state['heading'] == (1, 0) else self.pygame.transform.rotate(agent._sprite, 180 if state['heading'][0] == -1 else state['heading'][1] * -90)
-                self.screen.blit(rotated_sprite,
-                    self.pygame.rect.Rect(agent_pos[0] - agent._sprite_size[0] / 2, agent_pos[1] - agent._sprite_size[1] / 2,
-                        agent._sprite_size[0], agent._sprite_size[1]))
-            else:
-                # Draw simple agent (circle with a short line segment poking out to indicate heading)
-                self.pygame.draw.circle(self.screen, agent_color, agent_pos, self.agent_circle_radius)
-                self.pygame.draw.line(self.screen, agent_color, agent_pos, state['location'], self.road_width)
-            if agent.get_next_waypoint() is not None:
-                self.screen.blit(self.font.render(agent.get_next_waypoint(), True, agent_color, self.bg_color), (agent_pos[0] + 10, agent_pos[1] + 10))
-            if state['destination'] is not None:
-                self.pygame.draw.circle(self.screen, agent_color, (state['destination'][0] * self.env.block_size, state['destination'][1] * self.env.block_size), 6)
-                self.pygame.draw.circle(self.screen, agent_color, (state['destination'][0] * self.env.block_size, state['destination'][1] * self.env.block_size), 15, 2)
-
-        # * Overlays
-        text_y = 10
-        for text in self.env.status_text.split('\n'):
-            self.screen.blit(self.font.render(text, True, self.colors['red'], self.bg_color), (100, text_y))
-            text_y += 20
-
-        # Flip buffers
-        self.pygame.display.flip()
+    def run_headless(self, n_trials=1, max_steps=None, first_trial=None):
+        """
+        Run trials back-to-back without a display, stepping by count instead of wall-clock time.
+
+        Parameters:
+        n_trials (int): Number of trials to run.
+        max_steps (int): Optional cap on the total number of environment steps.
+        first_trial (int): Number of the first trial (see run).
+
+        Returns:
+        dict: Run statistics (trials, successes, steps, elapsed seconds, steps/sec, trials/sec).
+        """
+        self.quit = False
+        env = self.env
+        n_steps = 0
+        trials_run = 0
+        successes = 0
+        first_trial = env.trial + 1 if first_trial is None else first_trial
+        start_time = time.perf_counter()
+        try:
+            for trial in range(first_trial, first_trial + n_trials):
+                log.info('Simulator.run', "Simulator.run(): Trial {}", trial)
+                env.reset(trial=trial)
+                self.begin_trial()
+                trials_run += 1
+                encoder = self.start_recording(trial)
+                if encoder is not None:
+                    self.capture(encoder)
+                while not env.done:
+                    env.step()
+                    n_steps += 1
+                    if encoder is not None and (env.t % self.record_every == 0 or env.done):
+                        self.capture(encoder)
+                    if max_steps is not None and n_steps >= max_steps:
+                        self.quit = True
+                        break
+                self.end_trial(encoder)
+                successes += env.success
+                if self.quit:
+                    break
+        except KeyboardInterrupt:
+            self.quit = True
+        self.flush_trace()
+
+        elapsed = time.perf_counter() - start_time
+        self.stats = {
+            'trials': trials_run,
+            'successes': successes,
+            'steps': n_steps,
+            'elapsed': elapsed,
+            'steps_per_sec': n_steps / elapsed if elapsed > 0 else float('inf'),
+            'trials_per_sec': trials_run / elapsed if elapsed > 0 else float('inf'),
+            'obs_cache_hits': env.obs_cache_hits,
+            'obs_cache_misses': env.obs_cache_misses}
+        log.info('Simulator.run_headless', "Simulator.run_headless(): {} trials, {} steps in {:.3f}s ({:.1f} steps/sec, {:.1f} trials/sec)",
+                 trials_run, n_steps, elapsed, self.stats['steps_per_sec'], self.stats['trials_per_sec'])
+        log.info('Simulator.run_headless', "Simulator.run_headless(): observation cache {} hits, {} misses", env.obs_cache_hits, env.obs_cache_misses)
+        return self.stats
+
+    def begin_trial(self):
+        """Mark the start of a trial in the trace, if one is being recorded."""
+        if self.env.recorder is not None:
+            self.env.recorder.begin_trial(self.env.trial)
+
+    def end_trial(self, encoder=None):
+        """
+        Record the summary of the trial that just ended in the trace, and save a checkpoint if one is due.
+
+        Parameters:
+        encoder (FrameEncoder): The trial's recording, if it was recorded; it finishes in the background.
+        """
+        if encoder is not None:
+            encoder.finish()
+        if self.env.recorder is not None:
+            self.env.recorder.end_trial(self.env.success)
+        if self.checkpoint is not None:
+            self.trials_since_checkpoint += 1
+            if self.trials_since_checkpoint >= self.checkpoint_every:
+                self.save_checkpoint()
+
+    def flush_trace(self):
+        """Write buffered trace records to disk, checkpoint trials not saved yet and wait for recordings to be written."""
+        if self.env.recorder is not None:
+            self.env.recorder.flush()
+        for encoder in self.encoders:
+            encoder.close()
+            log.info('Simulator.flush_trace', "Simulator.flush_trace(): recorded {} ({} frames, {} dropped)", encoder.path, encoder.frames, encoder.dropped)
+        self.encoders = []
+        if self.checkpoint is not None and self.trials_since_checkpoint:
+            self.save_checkpoint()
+
+    def save_checkpoint(self):
+        """Save the primary agent's Q-table to the checkpoint file."""
+        from checkpoint import save_checkpoint
+        save_checkpoint(self.checkpoint, self.env.primary_agent)
+        self.trials_since_checkpoint = 0
+        log.debug('Simulator.save_checkpoint', "Simulator.save_checkpoint(): saved {}", self.checkpoint)
+
+    def start_recording(self, trial):
+        """
+        Start recording a trial, if it is one to record.
+
+        Parameters:
+        trial (int): The trial number.
+
+        Returns:
+        FrameEncoder: The trial's encoder, or None if it is not recorded.
+        """
+        if not self.record or (self.record_trials is not None and trial not in self.record_trials):
+            return None
+        from video import FrameEncoder
+        encoder = FrameEncoder(self.record.format(trial=trial), self.size, self.record_fps)
+        self.encoders.append(encoder)
+        return encoder
+
+    def frame(self):
+        """Get the pixels of the screen as RGBX bytes."""
+        image = self.pygame.image
+        return (image.tobytes if hasattr(image, 'tobytes') else image.tostring)(self.screen, 'RGBX')  # tobytes is pygame >= 2.1.3
+
+    def capture(self, encoder):
+        """Render the environment and queue the frame for encoding."""
+        self.render()
+        encoder.submit(self.frame())
+
+    def render(self, full=False):
+        """
+        Render the simulation environment using PyGame.
+
+        Parameters:
+        full (bool): Redraw the whole window instead of only what changed (see renderer.Renderer).
+        """
+        self.renderer.draw(full)
 
     def pause(self):
-        """Pause the simulation."""
-        abs_pause_time = time.time()
+        """
+        Pause the simulation until a key is pressed, blocking on the event queue.
+
+        Returns:
+        float: Seconds spent paused.
+        """
+        abs_pause_time = time.perf_counter()
         pause_text = "[PAUSED] Press any key to continue..."
         self.screen.blit(self.font.render(pause_text, True, self.colors['cyan'], self.bg_color), (100, self.height - 40))
         self.pygame.display.flip()
-        print(pause_text)  # [debug]
+        log.info('Simulator.pause', pause_text)
         while self.paused:
-            for event in self.pygame.event.get():
-                if event.type == self.pygame.KEYDOWN:
-                    self.paused = False
-            self.pygame.time.wait(self.frame_delay)
-        self.screen.blit(self.font.render(pause_text, True, self.bg_color, self.bg_color), (100, self.height - 40))
-        self.start_time += (time.time() - abs_pause_time)
+            event = self.pygame.event.wait()
+            if event.type == self.pygame.QUIT:
+                self.quit = True
+                self.paused = False
+            elif event.type == self.pygame.KEYDOWN:
+                self.paused = False
+        self.render(full=True)  # Clear the pause message
+        return time.perf_counter() - abs_pause_time
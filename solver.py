@@ -0,0 +1,173 @@
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from qtable import STATES, ACTIONS, ArrayQTable, DictQTable, table_arrays, encode_states
+from vec_environment import VecEnvironment
+
+
+def reward_model():
+    """
+    Compute the expected reward of every (state, action) pair from the rules of Environment.act.
+
+    The bonus for reaching the destination is left out: it depends on the car's location,
+    which the (light, oncoming, left, waypoint) state does not include.
+
+    Returns:
+    ndarray: (n_states, n_actions) rewards indexed by state id and action id.
+    """
+    rewards = np.zeros((len(STATES), len(ACTIONS)))
+    for i, (light, oncoming, left, waypoint) in enumerate(STATES):
+        for j, action in enumerate(ACTIONS):
+            if action is None:
+                continue
+            if action == 'forward':
+                move_okay = light == 'green'
+            elif action == 'left':
+                move_okay = light == 'green' and (oncoming is None or oncoming == 'left')
+            else:
+                move_okay = True  # Environment.act allows right turns on red
+            rewards[i, j] = (2.0 if action == waypoint else -0.5) if move_okay else -1.0
+    return rewards
+
+
+def estimate_transitions(n_envs=1024, n_steps=200, grid_size=(8, 6), num_dummies=3, seed=None):
+    """
+    Estimate P(s' | s, a) by driving batches of worlds with uniformly random actions.
+
+    Steps that end a trial are left out: the world is reset straight away, and the state
+    observed after them belongs to the next trial.
+
+    Parameters:
+    n_envs (int): Number of worlds simulated together.
+    n_steps (int): Number of steps per world.
+    grid_size (tuple): Grid size as (cols, rows).
+    num_dummies (int): Number of dummy agents per world.
+    seed (int): Seed of the simulation.
+
+    Returns:
+    tuple: (P, counts) where P is an (n_states, n_actions, n_states) array of transition
+        probabilities (all zero for pairs never sampled) and counts the samples per pair.
+    """
+    n_states, n_actions = len(STATES), len(ACTIONS)
+    vec = VecEnvironment(n_envs, grid_size=grid_size, num_dummies=num_dummies, seed=seed)
+    obs = vec.reset()
+    states = encode_states(obs['light'], obs['oncoming'], obs['left'], obs['waypoint'])
+    samples = np.zeros(n_states * n_actions * n_states, dtype=np.int64)
+    for _ in range(n_steps):
+        actions = vec.rng.integers(0, n_actions, size=n_envs)
+        obs, rewards, done = vec.step(actions)
+        next_states = encode_states(obs['light'], obs['oncoming'], obs['left'], obs['waypoint'])
+        # A world whose trial ended was reset, so its observation is the start of a new trial, not where the action led
+        live = ~done
+        samples += np.bincount(((states * n_actions + actions) * n_states + next_states)[live], minlength=samples.size)
+        states = next_states
+
+    samples = samples.reshape(n_states, n_actions, n_states)
+    counts = samples.sum(axis=2)
+    P = samples / np.maximum(counts, 1)[:, :, None]
+    return P, counts
+
+
+def value_iteration(P, R, gamma=0.5, tol=1e-8, max_iterations=10000):
+    """
+    Compute optimal Q-values by value iteration.
+
+    Parameters:
+    P (ndarray): (n_states, n_actions, n_states) transition probabilities.
+    R (ndarray): (n_states, n_actions) expected rewards.
+    gamma (float): Discount factor.
+    tol (float): Stop once no Q-value changes by more than this.
+    max_iterations (int): Upper bound on the number of sweeps.
+
+    Returns:
+    tuple: (Q, number of sweeps).
+    """
+    Q = np.zeros_like(R)
+    for iteration in range(1, max_iterations + 1):
+        Q_next = R + gamma * (P @ Q.max(axis=1))
+        delta = np.abs(Q_next - Q).max()
+        Q = Q_next
+        if delta <= tol:
+            break
+    return Q, iteration
+
+
+def solve(gamma=0.5, n_envs=1024, n_steps=200, grid_size=(8, 6), num_dummies=3, seed=None):
+    """
+    Estimate the transition model and compute optimal Q-values for it.
+
+    Returns:
+    tuple: (Q, counts) where counts are the transition samples behind each (state, action) pair.
+    """
+    P, counts = estimate_transitions(n_envs, n_steps, grid_size, num_dummies, seed)
+    Q, iterations = value_iteration(P, reward_model(), gamma)
+    return Q, counts
+
+
+def initialize_agent(agent, Q):
+    """
+    Set a LearningAgent's Q-table to the given Q-values, e.g. a solution to start learning from.
+
+    Parameters:
+    agent (LearningAgent): The agent.
+    Q (ndarray): (n_states, n_actions) Q-values indexed by state id and action id.
+    """
+    table = agent.qs
+    if isinstance(table, ArrayQTable):
+        table.q[:] = Q
+        table.invalidate()
+    elif isinstance(table, DictQTable):
+        table.qs = {(state, action): float(Q[i, j]) for i, state in enumerate(STATES) for j, action in enumerate(ACTIONS)}
+    else:
+        raise TypeError("Unsupported Q-table type: {}".format(type(table).__name__))
+
+
+def compare(table, Q, counts=None):
+    """
+    Compare a learned Q-table against a solution.
+
+    Parameters:
+    table (ArrayQTable or DictQTable): The learned Q-table.
+    Q (ndarray): The solution's Q-values.
+    counts (ndarray): Transition samples per (state, action) pair; if given, only states
+        whose every action was sampled are compared.
+
+    Returns:
+    dict: 'states' compared, 'greedy_agreement' (fraction of states where a learned greedy
+        action is also optimal) and 'max_abs_error' of the Q-values.
+    """
+    q = table_arrays(table)[0]
+    states = (counts > 0).all(axis=1) if counts is not None else np.ones(len(STATES), dtype=bool)
+    learned_greedy = q == q.max(axis=1, keepdims=True)
+    optimal = np.isclose(Q, Q.max(axis=1, keepdims=True))
+    agree = (learned_greedy & optimal).any(axis=1)
+    return {
+        'states': int(states.sum()),
+        'greedy_agreement': float(agree[states].mean()) if states.any() else 0.0,
+        'max_abs_error': float(np.abs(q - Q)[states].max()) if states.any() else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute optimal Q-values for the smartcab world by value iteration.")
+    parser.add_argument('--gamma', type=float, default=0.5, help="discount factor")
+    parser.add_argument('--envs', type=int, default=1024, help="worlds simulated together to estimate transitions")
+    parser.add_argument('--steps', type=int, default=200, help="steps per world")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the simulation")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    P, counts = estimate_transitions(args.envs, args.steps, seed=args.seed)
+    Q, iterations = value_iteration(P, reward_model(), args.gamma)
+    elapsed = time.perf_counter() - start
+    print("Estimated transitions from {} samples ({} of {} states fully sampled); value iteration converged in {} sweeps; {:.2f}s total".format(
+        counts.sum(), int((counts > 0).all(axis=1).sum()), len(STATES), iterations, elapsed))
+    for i, state in enumerate(STATES):
+        if counts[i].any():
+            print("{}: {} ({})".format(state, ACTIONS[int(np.argmax(Q[i]))], ', '.join('{:.2f}'.format(v) for v in Q[i])))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,114 @@
+import sys
+import csv
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from environment import Environment
+from simulator import Simulator
+from agent import LearningAgent, alpha_schedules
+from events import log
+
+# Columns of the result table, in output order
+columns = ('alpha', 'gamma', 'trials', 'seed', 'successes', 'success_rate', 'total_reward', 'errors', 'steps', 'elapsed')
+
+
+def run_config(alpha, gamma, n_trials, seed):
+    """
+    Train a LearningAgent in its own headless environment.
+
+    Parameters:
+    alpha (str or float): Learning rate schedule (see agent.alpha_schedule).
+    gamma (float): Discount factor.
+    n_trials (int): Number of trials to run.
+    seed (int): Random seed of the run.
+
+    Returns:
+    dict: One row of the result table.
+    """
+    log.set_level('WARNING')  # Keep workers quiet; results are collected in the table
+    e = Environment(seed=seed)
+    a = e.create_agent(LearningAgent, gamma=gamma, alpha=alpha)
+    e.set_primary_agent(a, enforce_deadline=True)
+    sim = Simulator(e, update_delay=0, display=False)
+    stats = sim.run_headless(n_trials)
+    return {
+        'alpha': alpha,
+        'gamma': gamma,
+        'trials': n_trials,
+        'seed': seed,
+        'successes': stats['successes'],
+        'success_rate': stats['successes'] / stats['trials'] if stats['trials'] else 0.0,
+        'total_reward': a.total_reward,
+        'errors': a.errors,
+        'steps': stats['steps'],
+        'elapsed': stats['elapsed']}
+
+
+def sweep(alphas=('inverse',), gammas=(0.5,), trials=(100,), seeds=(0,), jobs=None):
+    """
+    Run every combination of hyperparameters in a process pool.
+
+    Parameters:
+    alphas (list): Learning rate schedules.
+    gammas (list): Discount factors.
+    trials (list): Trial counts.
+    seeds (list): Random seeds.
+    jobs (int): Number of worker processes (all cores if None, in-process if 1).
+
+    Returns:
+    list: Result rows (see run_config), in the order of the grid.
+    """
+    configs = list(itertools.product(alphas, gammas, trials, seeds))
+    if jobs == 1:
+        return [run_config(*config) for config in configs]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(run_config, *zip(*configs)))
+
+
+def print_table(rows, stream=None):
+    """Print result rows as an aligned text table."""
+    stream = stream or sys.stdout
+    cells = [[('{:.3f}' if isinstance(row[c], float) else '{}').format(row[c]) for c in columns] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    stream.write('  '.join(c.rjust(w) for c, w in zip(columns, widths)) + '\n')
+    for r in cells:
+        stream.write('  '.join(v.rjust(w) for v, w in zip(r, widths)) + '\n')
+
+
+def write_csv(rows, path):
+    """Write result rows to a CSV file."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_alpha(spec):
+    """Parse an alpha schedule argument: a schedule name, or a constant learning rate."""
+    if spec in alpha_schedules:
+        return spec
+    try:
+        return float(spec)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected one of {} or a number, got {!r}".format(', '.join(alpha_schedules), spec))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep LearningAgent hyperparameters across a process pool.")
+    parser.add_argument('--alpha', nargs='+', type=parse_alpha, default=['inverse'], help="learning rate schedules: 'inverse', 'inverse_sqrt' or a constant")
+    parser.add_argument('--gamma', nargs='+', type=float, default=[0.5], help="discount factors")
+    parser.add_argument('--trials', nargs='+', type=int, default=[100], help="trial counts")
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0], help="random seeds")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--output', help="also write the result table to this CSV file")
+    args = parser.parse_args(argv)
+
+    rows = sweep(args.alpha, args.gamma, args.trials, args.seeds, args.jobs)
+    print_table(rows)
+    if args.output:
+        write_csv(rows, args.output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
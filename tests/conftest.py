@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The simulator modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import log, OFF
+
+log.set_level(OFF)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from qtable import ArrayQTable
+from actor_learner import TransitionRing, train
+
+
+def test_ring_drops_when_full_and_drains_in_order():
+    ring = TransitionRing(4)
+    try:
+        ring.counters[:] = 0
+        for k in range(6):
+            ring.push(k, k % 4, float(k), k + 1)
+        states, actions, rewards, next_states = ring.pop_all()
+        assert states.tolist() == [0, 1, 2, 3]
+        assert ring.counters[5] == 2  # Dropped
+        ring.push(9, 0, 0.0, 0)
+        assert ring.pop_all()[0].tolist() == [9]
+        assert len(ring.pop_all()[0]) == 0
+    finally:
+        ring.close()
+        ring.shm.unlink()
+
+
+def test_actors_feed_the_learner():
+    table, stats = train(n_actors=2, trials_per_actor=20, seed=3)
+    assert isinstance(table, ArrayQTable)
+    assert stats['trials'] == 40
+    assert stats['transitions'] + stats['dropped'] == stats['steps'] - stats['trials']
+    assert table.visits.sum() == stats['transitions']
+    assert np.count_nonzero(table.q) > 0
+
+
+def test_learner_with_a_constant_alpha_stays_bounded():
+    # Each drain holds many repeats of the same (state, action); they must not multiply alpha
+    table, stats = train(n_actors=2, trials_per_actor=30, alpha=1.0, seed=3, poll_interval=0.05)
+    assert stats['transitions'] > 0
+    assert np.abs(table.q).max() < 50
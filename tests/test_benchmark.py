@@ -0,0 +1,34 @@
+import json
+
+import benchmark
+
+
+def test_runs_every_benchmark_for_every_configuration():
+    results = benchmark.run_benchmarks(grids=[(4, 4)], dummies=[0, 2], n_trials=2, repeat=1, min_time=0.001)
+    assert len(results) == 2 * 7
+    assert 'Environment.step[4x4, 2 dummies]' in results
+    assert 'Simulator.run_headless[4x4, 0 dummies]' in results
+    assert all(result['seconds'] > 0 for result in results.values())
+    only = benchmark.run_benchmarks(grids=[(4, 4)], dummies=[0], n_trials=2, repeat=1, min_time=0.001, only='next_waypoint')
+    assert list(only) == ['RoutePlanner.next_waypoint[4x4, 0 dummies]']
+
+
+def test_compare_flags_slow_downs_beyond_the_threshold():
+    baseline = {'a': {'seconds': 1.0}, 'b': {'seconds': 1.0}, 'gone': {'seconds': 1.0}}
+    results = {'a': {'seconds': 1.1}, 'b': {'seconds': 1.5}, 'new': {'seconds': 1.0}}
+    rows = benchmark.compare(results, baseline, threshold=0.2)
+    assert [(name, regressed) for name, before, after, change, regressed in rows] == [('a', False), ('b', True)]
+
+
+def test_main_exits_nonzero_on_regression(tmp_path):
+    args = ['--grids', '4x4', '--dummies', '0', '--trials', '2', '--repeat', '1', '--min-time', '0.001', '--only', 'best_action']
+    baseline = tmp_path / 'baseline.json'
+    assert benchmark.main(args + ['--output', str(baseline)]) == 0
+    saved = json.loads(baseline.read_text())
+    assert set(saved) == {'environment', 'results'}
+
+    assert benchmark.main(args + ['--baseline', str(baseline), '--threshold', '1000']) == 0
+    for result in saved['results'].values():
+        result['seconds'] /= 1000.0  # A baseline far faster than anything this machine can do
+    baseline.write_text(json.dumps(saved))
+    assert benchmark.main(args + ['--baseline', str(baseline)]) == 1
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from environment import Environment
+from agent import LearningAgent
+from simulator import Simulator
+import checkpoint
+from checkpoint import save_checkpoint, load_checkpoint, restore_agent
+from events import EventLog, WARNING
+
+
+def trained_agent(tmp_path=None, qtable='array', n_trials=20):
+    env = Environment(seed=1)
+    agent = env.create_agent(LearningAgent, qtable=qtable)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    sim = Simulator(env, update_delay=0, display=False, checkpoint=str(tmp_path / 'q.bin') if tmp_path else None, checkpoint_every=5)
+    sim.run(n_trials)
+    return agent
+
+
+def fresh_agent(qtable='array'):
+    env = Environment(seed=2)
+    return env.create_agent(LearningAgent, qtable=qtable)
+
+
+def test_round_trip(tmp_path):
+    agent = trained_agent()
+    path = str(tmp_path / 'q.bin')
+    save_checkpoint(path, agent)
+    q, visits, time, gamma = load_checkpoint(path, mode='r')
+    assert np.array_equal(q, agent.qs.q)
+    assert np.array_equal(visits, agent.qs.visits)
+    assert visits.sum() == time == agent.time
+    assert gamma == agent.gamma
+
+
+def test_restore_warm_starts_and_read_only_mode(tmp_path):
+    agent = trained_agent()
+    path = str(tmp_path / 'q.bin')
+    save_checkpoint(path, agent)
+
+    warm = fresh_agent()
+    restore_agent(warm, path, mode='c')
+    assert warm.time == agent.time
+    state = ('green', None, None, 'forward')
+    assert warm.qs.best_action(state)[1] == agent.qs.best_action(state)[1]
+    warm.qs.update(state, 'forward', 100.0, 0.5)  # Copy-on-write: the file is not changed
+    assert np.array_equal(load_checkpoint(path, mode='r')[0], agent.qs.q)
+
+    frozen = fresh_agent()
+    restore_agent(frozen, path, mode='r')
+    with pytest.raises(ValueError):
+        frozen.qs.update(state, 'forward', 100.0, 0.5)
+
+
+def test_dict_table_round_trip(tmp_path):
+    agent = trained_agent(qtable='dict')
+    path = str(tmp_path / 'q.bin')
+    save_checkpoint(path, agent)
+    restored = fresh_agent(qtable='dict')
+    restore_agent(restored, path)
+    assert restored.qs.qs == {key: value for key, value in agent.qs.qs.items()}
+    assert restored.qs.visits == agent.qs.visits
+
+
+def test_simulator_saves_periodic_checkpoints(tmp_path):
+    agent = trained_agent(tmp_path, n_trials=12)
+    q, visits, time, gamma = load_checkpoint(str(tmp_path / 'q.bin'), mode='r')
+    assert time == agent.time  # The final checkpoint covers the last two trials
+    assert not list(tmp_path.glob('*.tmp*'))
+
+
+def test_restore_keeps_the_agents_gamma_unless_asked(tmp_path, monkeypatch):
+    events = EventLog(level=WARNING, echo=False)
+    monkeypatch.setattr(checkpoint, 'log', events)
+    path = str(tmp_path / 'q.bin')
+    save_checkpoint(path, trained_agent())  # Trained with gamma = 0.5
+
+    agent = Environment(seed=2).create_agent(LearningAgent, gamma=0.9)
+    restore_agent(agent, path)
+    assert agent.gamma == 0.9
+    assert len(events.recent()) == 1 and 'gamma = 0.5' in events.recent()[0]
+
+    restore_agent(agent, path, use_saved_gamma=True)
+    assert agent.gamma == 0.5
+    restore_agent(agent, path)  # Same gamma: nothing to warn about
+    assert len(events.recent()) == 1
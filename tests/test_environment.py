@@ -0,0 +1,195 @@
+import random
+
+import pytest
+
+from environment import Environment, DummyAgent
+from agent import LearningAgent
+
+
+def naive_sense(env, agent):
+    """Sense by scanning every agent, as Environment.sense did before the occupancy index."""
+    state = env.agent_states[agent]
+    location = state['location']
+    heading = state['heading']
+    light = 'green' if (env.intersections[location].state and heading[1] != 0) or ((not env.intersections[location].state) and heading[0] != 0) else 'red'
+
+    oncoming = None
+    left = None
+    right = None
+    for other_agent, other_state in env.agent_states.items():
+        if agent == other_agent or location != other_state['location'] or (heading[0] == other_state['heading'][0] and heading[1] == other_state['heading'][1]):
+            continue
+        other_heading = other_agent.get_next_waypoint()
+        if (heading[0] * other_state['heading'][0] + heading[1] * other_state['heading'][1]) == -1:
+            if oncoming != 'left':
+                oncoming = other_heading
+        elif (heading[1] == other_state['heading'][0] and -heading[0] == other_state['heading'][1]):
+            if right != 'forward' and right != 'left':
+                right = other_heading
+        else:
+            if left != 'forward':
+                left = other_heading
+
+    return {'light': light, 'oncoming': oncoming, 'left': left, 'right': right}
+
+
+def crowded_environment(seed, num_dummies=40):
+    """A small grid with enough dummy traffic that most intersections hold several cars."""
+    random.seed(seed)
+    env = Environment(grid_size=(3, 3), num_dummies=num_dummies)
+    env.reset()
+    return env
+
+
+def test_occupancy_matches_agent_locations():
+    env = crowded_environment(0)
+    for _ in range(200):
+        env.step()
+        occupied = {}
+        for agent in env.agent_states.agents:
+            occupied.setdefault(env.agent_states.location[agent.id], set()).add(agent)
+        assert {location: set(occupants) for location, occupants in env.occupancy.items()} == occupied
+
+
+def test_indexed_sense_matches_naive_scan():
+    env = crowded_environment(1)
+    states = env.agent_states
+    for _ in range(200):
+        env.step()
+        for agent in states.agents:
+            assert env._sense(agent, states.location[agent.id], states.heading[agent.id]) == naive_sense(env, agent)
+
+
+def test_state_writes_update_occupancy():
+    env = crowded_environment(2, num_dummies=3)
+    agent = env.agent_states.agents[0]
+    env.sense(agent)
+    env.agent_states[agent]['location'] = (3, 3)
+    assert agent in env.occupancy[env.intersections.index((3, 3))]
+    assert env.sense(agent) == naive_sense(env, agent)
+
+
+def test_cached_sense_matches_naive_scan():
+    env = crowded_environment(3)
+    for _ in range(200):
+        env.step()
+        for agent in env.agent_states.agents:
+            assert env.sense(agent) == naive_sense(env, agent)
+            agent.next_waypoint = random.choice(Environment.valid_actions[1:])  # Must invalidate the cache
+            assert env.sense(agent) == naive_sense(env, agent)
+    assert env.obs_cache_hits > 0
+
+
+class ToggledLight(object):
+    """A light toggled step by step, as TrafficLight.update(t) did before the closed form."""
+
+    def __init__(self, state, period):
+        self.state = state
+        self.period = period
+        self.last_updated = 0
+
+    def update(self, t):
+        if t - self.last_updated >= self.period:
+            self.state = not self.state
+            self.last_updated = t
+
+    def reset(self):
+        self.last_updated = 0
+
+
+def test_closed_form_lights_match_step_by_step_toggling():
+    random.seed(4)
+    env = Environment(grid_size=(5, 3), num_dummies=0)
+    reference = {location: ToggledLight(light.state, light.period) for location, light in env.intersections.items()}
+    for trial_length in (17, 1, 0, 60, 23):  # Each reset keeps the lights' current states
+        env.reset()
+        for light in reference.values():
+            light.reset()
+        for _ in range(trial_length):
+            for light in reference.values():
+                light.update(env.t)
+            env.step()
+            states = env.lights.states()
+            for location, light in reference.items():
+                assert env.intersections[location].state == light.state
+                assert states[env.intersections.index(location)] == light.state
+
+
+def naive_move(env, location, heading, action):
+    """Move a car the way Environment.act did before the transition table."""
+    if action == 'left':
+        heading = (heading[1], -heading[0])
+    elif action == 'right':
+        heading = (-heading[1], heading[0])
+    if action is None:
+        return location, heading
+    cols, rows = env.grid_size
+    return ((location[0] + heading[0] - 1) % cols + 1, (location[1] + heading[1] - 1) % rows + 1), heading
+
+
+def test_move_matches_naive_movement():
+    env = Environment(grid_size=(5, 3), num_dummies=0, seed=0)
+    computed = Environment(grid_size=(5, 3), num_dummies=0, seed=0)
+    computed.next_location = computed.next_heading = None  # Resolve moves without the table, as on large grids
+    for location in env.intersections:
+        for heading in Environment.valid_headings:
+            for action in Environment.valid_actions:
+                expected = naive_move(env, location, heading, action)
+                assert env.move(location, heading, action) == expected
+                assert computed.move(location, heading, action) == expected
+
+
+def test_generated_grid_matches_materialized_grid():
+    env = Environment(grid_size=(5, 3), num_dummies=0, seed=0)
+    locations = [(x, y) for x in range(1, 6) for y in range(1, 4)]  # The order intersections were inserted in
+    assert list(env.intersections) == locations
+    assert [env.intersections.index(location) for location in locations] == list(range(len(locations)))
+    assert [env.intersections.location(i) for i in range(len(locations))] == locations
+    assert (0, 1) not in env.intersections and (6, 3) not in env.intersections
+    roads = [(a, b) for a in locations for b in locations if a != b and abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1]
+    assert list(env.roads) == roads
+    assert len(env.roads) == len(roads)
+
+
+def test_grids_too_small_for_a_trip_are_rejected():
+    with pytest.raises(ValueError):
+        Environment(grid_size=(2, 3))
+    Environment(grid_size=(1, 5), num_dummies=0)  # Long enough in one direction
+
+
+def test_agent_state_view_round_trips():
+    env = Environment(grid_size=(5, 3), num_dummies=2, seed=0)
+    env.reset(trial=0)
+    dummy = env.agent_states.agents[0]
+    state = env.agent_states[dummy]
+    assert set(state) == {'location', 'heading', 'destination', 'deadline'}
+    assert state['destination'] is None and state['deadline'] is None
+    env.agent_states[dummy] = {'location': (4, 2), 'heading': (-1, 0), 'destination': (1, 3), 'deadline': 7}
+    assert dict(state) == {'location': (4, 2), 'heading': (-1, 0), 'destination': (1, 3), 'deadline': 7}
+    assert env.agent_states.location[dummy.id] == env.intersections.index((4, 2))
+    state['deadline'] = None
+    assert state['deadline'] is None and not env.agent_states.has_deadline[dummy.id]
+    with pytest.raises(KeyError):
+        state['speed']
+
+
+def test_heading_writes_invalidate_cached_observations():
+    env = Environment(grid_size=(5, 3), num_dummies=2, seed=0)
+    env.reset(trial=0)
+    a, b = env.agent_states.agents
+    for agent, heading in ((a, (1, 0)), (b, (-1, 0))):
+        env.agent_states[agent]['location'] = (2, 2)
+        env.agent_states[agent]['heading'] = heading
+    assert env.sense(a)['oncoming'] == b.get_next_waypoint()
+    env.agent_states[b]['heading'] = (0, 1)  # Now approaching from a's left
+    assert env.sense(a) == naive_sense(env, a)
+    assert env.sense(a)['oncoming'] is None
+
+
+def test_agents_have_no_instance_dict():
+    env = Environment(grid_size=(5, 3), num_dummies=1, seed=0)
+    agent = env.create_agent(LearningAgent)
+    for instance in (env.agent_states.agents[0], env.agent_states[agent]):
+        assert not hasattr(instance, '__dict__')
+    with pytest.raises(AttributeError):
+        env.agent_states.agents[0].speed = 1
@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+from events import EventLog, DEBUG, INFO, WARNING
+
+
+class Unformattable(object):
+    def __format__(self, spec):
+        raise AssertionError("a dropped event was formatted")
+
+
+def test_events_below_the_level_are_dropped_unformatted():
+    stream = io.StringIO()
+    log = EventLog(level=INFO, stream=stream)
+    assert not log.debug_enabled and log.info_enabled and log.warning_enabled
+    log.debug('test', "{}", Unformattable())
+    log.info('test', "step {} of {}", 1, 2)
+    log.warning('test', "done")
+    assert log.recent() == ["step 1 of 2", "done"]
+    assert stream.getvalue() == "step 1 of 2\ndone\n"
+
+
+def test_ring_buffer_keeps_the_most_recent_events():
+    log = EventLog(level=DEBUG, capacity=3, echo=False)
+    for k in range(5):
+        log.debug('test', "event {}", k)
+    assert log.recent() == ["event 2", "event 3", "event 4"]
+    assert log.recent(1) == ["event 4"]
+
+
+def test_levels_can_be_set_by_name():
+    log = EventLog(echo=False)
+    log.set_level('warning')
+    assert log.level == WARNING and not log.info_enabled
+    log.set_level('OFF')
+    assert not log.warning_enabled
+    with pytest.raises(ValueError):
+        log.set_level('LOUD')
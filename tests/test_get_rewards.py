@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+import get_rewards
+from get_rewards import analyze_logs, chunk_file, PASS_LINE, FAIL_LINE, ABORT_PREFIX, TRIAL_PREFIX, REWARD_LINE
+
+
+def legacy_log(n_trials=40, seed=0):
+    """Lines of a model_output.csv-style log: a header, then trials of rewards, noise and outcomes."""
+    rng = random.Random(seed)
+    lines = ['output']
+    for trial in range(n_trials):
+        lines.append(TRIAL_PREFIX + str(trial))
+        for t in range(rng.randint(1, 12)):
+            lines.append("LearningAgent.update(): deadline = {}, inputs = {{'light': 'red', 'oncoming': None}}".format(20 - t))
+            lines.append(REWARD_LINE)
+            lines.append(str(rng.choice([2.0, -0.5, -1.0, 0.0, 12.0])))
+        lines.append(rng.choice([PASS_LINE, FAIL_LINE, ABORT_PREFIX + ' (-100)! Trial aborted.']))
+    return lines
+
+
+def legacy_totals(lines):
+    """Count a log the way the original line-by-line get_rewards.py did."""
+    passes = fails = 0
+    rewards = errors = 0.0
+    trials = []
+    for i, line in enumerate(lines[1:], 1):
+        if line == REWARD_LINE:
+            reward = float(lines[i + 1])
+            rewards += reward
+            trials[-1][1] += reward
+            if reward < 0:
+                errors += reward
+                trials[-1][2] += reward
+        elif line == PASS_LINE:
+            passes += 1
+            trials[-1][0] = 'pass'
+        elif line == FAIL_LINE:
+            fails += 1
+            trials[-1][0] = 'fail'
+        elif line.startswith(ABORT_PREFIX):
+            trials[-1][0] = 'fail'
+        elif line.startswith(TRIAL_PREFIX):
+            trials.append([None, 0.0, 0.0])
+    return passes, fails, rewards, errors, trials
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+@pytest.mark.parametrize('encoding, bom', [('utf-16-le', b'\xff\xfe'), ('utf-16-be', b'\xfe\xff')])
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_chunked_analysis_matches_the_legacy_totals(tmp_path, monkeypatch, newline, encoding, bom, jobs):
+    lines = legacy_log()
+    text = newline.join(lines) + newline
+    path = str(tmp_path / 'model_output.csv')
+    with open(path, 'wb') as f:
+        f.write(bom + text.encode(encoding))
+
+    monkeypatch.setattr(get_rewards, 'MIN_CHUNK_SIZE', 2)
+    chunk_size = 202  # Tiny chunks, so their boundaries land in the middle of lines
+    line_starts = set()
+    offset = len(bom)
+    for line in lines:
+        line_starts.add(offset)
+        offset += len((line + newline).encode(encoding))
+    bounds = [chunk[2] for chunk in chunk_file(path, chunk_size)]
+    assert len(bounds) > 20 and any(bound not in line_starts for bound in bounds)
+
+    stats, = analyze_logs([path], jobs=jobs, chunk_size=chunk_size, keep_trials=True)
+    passes, fails, rewards, errors, trials = legacy_totals(lines)
+    assert (stats.passes, stats.fails) == (passes, fails)
+    # Rewards are multiples of 0.5, so sums in any order are exact
+    assert (stats.total_rewards, stats.total_errors) == (rewards, errors)
+    assert stats.trials == trials
@@ -0,0 +1,35 @@
+import pytest
+
+from environment import Environment
+from agent import LearningAgent
+from planner import RoutePlanner, compute_waypoint, waypoint_array
+
+
+@pytest.mark.parametrize('grid_size', [(5, 3), (3, 5)])
+def test_waypoint_array_matches_compute_waypoint(grid_size):
+    env = Environment(grid_size=grid_size, num_dummies=0, seed=0)
+    waypoints = waypoint_array(grid_size)
+    assert waypoints.shape == (len(env.intersections), 4, len(env.intersections))
+    for location in env.intersections:
+        for h, heading in enumerate(Environment.valid_headings):
+            for destination in env.intersections:
+                code = waypoints[env.intersections.index(location), h, env.intersections.index(destination)]
+                assert Environment.valid_actions[code] == compute_waypoint(location, heading, destination)
+
+
+@pytest.mark.parametrize('use_table', [True, False])
+def test_next_waypoint_matches_compute_waypoint(monkeypatch, use_table):
+    if not use_table:
+        monkeypatch.setattr(RoutePlanner, 'max_table_intersections', 0)  # Compute waypoints directly, as on large grids
+    env = Environment(grid_size=(5, 3), num_dummies=0, seed=0)
+    agent = env.create_agent(LearningAgent)
+    env.set_primary_agent(agent)
+    state = env.agent_states[agent]
+    for destination in [(1, 1), (4, 2), (5, 3)]:
+        agent.planner.route_to(destination)
+        assert (agent.planner._waypoints is not None) == use_table
+        for location in env.intersections:
+            for heading in Environment.valid_headings:
+                state['location'] = location
+                state['heading'] = heading
+                assert agent.planner.next_waypoint() == compute_waypoint(location, heading, destination)
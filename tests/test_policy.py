@@ -0,0 +1,44 @@
+import numpy as np
+
+from environment import Environment
+from agent import LearningAgent
+from simulator import Simulator
+from qtable import STATES, ACTIONS, STATE_IDS, encode_state
+from policy import GreedyPolicy, PolicyAgent
+from vec_environment import VecEnvironment
+
+
+def trained_agent():
+    env = Environment(seed=4)
+    agent = env.create_agent(LearningAgent)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    Simulator(env, update_delay=0, display=False).run(50)
+    return agent
+
+
+def test_policy_is_greedy_with_ties_fixed():
+    q = trained_agent().qs.q
+    policy = GreedyPolicy.from_q(q, seed=0)
+    assert (q[np.arange(len(STATES)), policy.actions] == q.max(axis=1)).all()
+    assert np.array_equal(GreedyPolicy.from_q(q, seed=0).actions, policy.actions)
+    for state in STATES[:10]:
+        assert policy.action(state) == ACTIONS[policy.act(np.array([encode_state(state)]))[0]]
+
+
+def test_batched_observations_match_single_states():
+    policy = GreedyPolicy.from_q(np.random.default_rng(1).random((len(STATES), len(ACTIONS))))
+    vec = VecEnvironment(64, seed=2)
+    obs = vec.reset()
+    actions = policy.act_observations(obs)
+    for k in range(vec.n_envs):
+        state = ('green' if obs['light'][k] else 'red', ACTIONS[obs['oncoming'][k]], ACTIONS[obs['left'][k]], ACTIONS[obs['waypoint'][k]])
+        assert actions[k] == policy.act(np.array([STATE_IDS[state]]))[0]
+
+
+def test_policy_agent_drives():
+    policy = GreedyPolicy.from_qtable(trained_agent().qs)
+    env = Environment(seed=5)
+    agent = env.create_agent(PolicyAgent, policy)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    stats = Simulator(env, update_delay=0, display=False).run(20)
+    assert stats['successes'] >= 15
@@ -0,0 +1,33 @@
+import random
+
+import numpy as np
+import pytest
+
+from qtable import STATES, ACTIONS, DictQTable, ArrayQTable, table_arrays, encode_states, STATE_IDS
+
+
+def test_backends_agree_on_a_seeded_update_sequence():
+    rng = random.Random(0)
+    tables = DictQTable(rng=random.Random(1)), ArrayQTable(rng=random.Random(1))
+    for _ in range(5000):
+        state, action = rng.choice(STATES[:40]), rng.choice(ACTIONS)  # Few states, so most are visited often
+        target, alpha = rng.uniform(-1, 2), rng.choice([1.0, 0.5, 0.1])
+        for table in tables:
+            table.update(state, action, target, alpha)
+
+    (dict_q, dict_visits), (array_q, array_visits) = (table_arrays(table) for table in tables)
+    assert np.allclose(dict_q, array_q)
+    assert (dict_visits == array_visits).all()
+    for state in STATES:
+        (dict_action, dict_value), (array_action, array_value) = (table.best_action(state) for table in tables)
+        assert dict_value == pytest.approx(array_value)  # The backends round the same update differently
+        row = array_q[STATE_IDS[state]]
+        optimal = {ACTIONS[j] for j in np.flatnonzero(np.isclose(row, row.max()))}
+        assert dict_action in optimal and array_action in optimal  # Equal when the greedy action is unique
+
+
+def test_encode_states_matches_state_ids():
+    ids = {action: i for i, action in enumerate(ACTIONS)}
+    light = np.array([state[0] == 'green' for state in STATES])
+    parts = [np.array([ids[state[k]] for state in STATES]) for k in (1, 2, 3)]
+    assert encode_states(light, *parts).tolist() == list(range(len(STATES)))
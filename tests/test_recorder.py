@@ -0,0 +1,29 @@
+from environment import Environment
+from agent import LearningAgent
+from simulator import Simulator
+from recorder import load_trace
+
+
+def make_simulator(trace):
+    env = Environment(seed=2)
+    agent = env.create_agent(LearningAgent)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    return Simulator(env, update_delay=0, display=False, trace=trace)
+
+
+def test_trace_records_the_environment_trial_numbers(tmp_path):
+    trace = str(tmp_path / 'run')
+    sim = make_simulator(trace)
+    stats = sim.run(3)
+    make_simulator(trace).run(2, first_trial=7)  # Appended replay of trials 7 and 8
+
+    steps, trials = load_trace(trace, mmap=False)
+    assert trials['trial'].tolist() == [0, 1, 2, 7, 8]
+    assert trials['success'][:3].sum() == stats['successes']
+    assert len(steps) == trials['steps'].sum()
+    assert sorted(set(steps['trial'].tolist())) == [0, 1, 2, 7, 8]
+    for record in trials:
+        rows = steps[steps['trial'] == record['trial']]
+        assert len(rows) == record['steps']
+        assert rows['t'].tolist() == list(range(len(rows)))
+        assert abs(float(rows['reward'].sum()) - float(record['total_reward'])) < 1e-3
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from environment import Environment, DummyAgent
+from simulator import Simulator
+from renderer import Renderer
+
+pygame = pytest.importorskip('pygame')
+
+
+class CountingSurface(pygame.Surface):
+    """An offscreen surface that remembers the area of every blit onto it."""
+
+    def __init__(self, size):
+        super(CountingSurface, self).__init__(size)
+        self.blitted = []
+
+    def blit(self, *args, **kwargs):
+        rect = super(CountingSurface, self).blit(*args, **kwargs)
+        self.blitted.append(rect)
+        return rect
+
+
+def make_renderer(seed=0):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.font.init()
+    env = Environment(seed=seed)
+    env.set_primary_agent(env.create_agent(DummyAgent))
+    env.reset(trial=0)
+    for agent in env.agent_states:
+        agent._sprite = pygame.Surface((32, 32))
+    size = ((env.grid_size[0] + 1) * env.block_size, (env.grid_size[1] + 1) * env.block_size)
+    screen = CountingSurface(size)
+    colors = Simulator.colors
+    renderer = Renderer(pygame, screen, env, pygame.font.Font(None, 28), colors, colors['white'], colors['black'], present=False)
+    return env, screen, renderer
+
+
+def test_frame_without_light_changes_blits_only_agent_rects():
+    env, screen, renderer = make_renderer()
+    renderer.draw()
+    assert renderer.update_lights() == []  # Nothing toggled since the first frame
+    previous = list(renderer.previous)
+    screen.blitted = []
+    renderer.draw()
+    restored, drawn = screen.blitted[:len(previous)], screen.blitted[len(previous):]
+    assert restored == previous  # Last frame's agent and text areas are restored from the layer...
+    assert drawn and all(rect in renderer.previous for rect in drawn)  # ...and the rest are this frame's agents and text
+
+
+def test_only_toggled_lights_are_redrawn():
+    env, screen, renderer = make_renderer()
+    renderer.draw()
+    before = env.lights.states()
+    env.lights.t = next(t for t in range(1, 100) if (env.lights.states(t) != before).any())
+    toggled = int((env.lights.states() != before).sum())
+    assert len(renderer.update_lights()) == toggled
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from environment import Environment
+from agent import LearningAgent
+from simulator import Simulator
+from qtable import ArrayQTable, STATES, ACTIONS
+from replay import ReplayBuffer
+
+
+def test_fifo_eviction_overwrites_oldest():
+    buffer = ReplayBuffer(4, rng=np.random.default_rng(0))
+    for k in range(6):
+        buffer.add(k, k % 4, float(k), k + 1)
+    assert len(buffer) == 4 and buffer.added == 6
+    assert sorted(buffer.states.tolist()) == [2, 3, 4, 5]
+    buffer.add_batch(np.array([10, 11, 12]), np.zeros(3), np.zeros(3), np.zeros(3))
+    assert sorted(buffer.states.tolist()) == [5, 10, 11, 12]
+
+
+def test_random_eviction_keeps_capacity():
+    buffer = ReplayBuffer(8, eviction='random', rng=np.random.default_rng(0))
+    buffer.add_batch(np.arange(20), np.zeros(20), np.zeros(20), np.zeros(20))
+    assert len(buffer) == 8
+    states, actions, rewards, next_states, dones = buffer.sample(100)
+    assert set(states.tolist()) <= set(range(20))
+    with pytest.raises(ValueError):
+        ReplayBuffer(8, eviction='lifo')
+
+
+def test_batch_update_steps_once_towards_the_mean_target():
+    table = ArrayQTable()
+    table.best_action(STATES[3])  # Fill the greedy cache
+    table.update_batch(np.array([3, 3, 5]), np.array([1, 1, 2]), np.array([2.0, 4.0, 1.0]), 0.5)
+    assert table.q[3, 1] == 1.5 and table.q[5, 2] == 0.5
+    assert table.visits[3, 1] == 2
+    assert table.best_action(STATES[3]) == (ACTIONS[1], 1.5)  # The cached greedy action was dropped
+
+
+def test_duplicates_with_a_constant_alpha_do_not_overshoot():
+    table = ArrayQTable()
+    for _ in range(50):
+        # 128 copies of one pair: summing their steps would multiply alpha by 128 and diverge
+        table.update_batch(np.full(128, 7), np.full(128, 2), np.full(128, 2.0) + 0.5 * table.q[7].max(), 1.0)
+    assert table.q[7, 2] == pytest.approx(4.0)  # The fixed point of q = 2 + 0.5 q
+    assert np.abs(table.q).max() <= 4.0
+
+
+def test_agent_learns_with_replay():
+    env = Environment(seed=6)
+    agent = env.create_agent(LearningAgent, replay_size=1000, replay_ratio=4.0, replay_batch=16)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    stats = Simulator(env, update_delay=0, display=False).run(30)
+    # Every step is stored, except the last of each trial that ran out of time (it has no next state)
+    assert len(agent.replay) == min(1000, stats['steps'] - (stats['trials'] - stats['successes']))
+    assert agent.replay.dones.sum() == stats['successes']
+    assert agent.qs.visits.sum() > 3 * stats['steps']
+    with pytest.raises(ValueError):
+        Environment(seed=6).create_agent(LearningAgent, qtable='dict', replay_size=10)
+
+
+def test_replay_with_a_constant_alpha_stays_bounded():
+    env = Environment(seed=0)
+    agent = env.create_agent(LearningAgent, alpha=0.5, replay_size=2000, replay_batch=128)
+    env.set_primary_agent(agent, enforce_deadline=True)
+    stats = Simulator(env, update_delay=0, display=False).run(100)
+    assert np.abs(agent.qs.q).max() < 50
+    assert stats['successes'] >= 90
+
+
+def test_arrival_is_replayed_as_terminal():
+    env = Environment(seed=0)
+    agent = env.create_agent(LearningAgent, alpha=1.0, replay_size=10, replay_batch=1)
+    agent.qs.q[5] = 100.0
+    agent.remember(5, 2, 12.0, 1.0, done=True)
+    assert agent.last_transition is None
+    assert agent.replay.dones[:len(agent.replay)].tolist() == [True]
+    assert agent.qs.q[5, 2] == 12.0  # The reward alone, without gamma * max Q of a next state
@@ -0,0 +1,56 @@
+from scheduler import FrameScheduler
+
+
+class FakeClock(object):
+    """A clock that only moves when slept on or advanced."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def make(step_interval, frame_interval):
+    clock = FakeClock()
+    return FrameScheduler(step_interval, frame_interval, clock=clock, sleep=clock.sleep), clock
+
+
+def test_sleeps_until_the_next_deadline():
+    scheduler, clock = make(0.5, 0.1)
+    assert scheduler.step_due() and scheduler.frame_due()
+    scheduler.stepped()
+    scheduler.drawn()
+    scheduler.wait()
+    assert clock.slept == [0.1]  # The next frame comes before the next step
+    assert scheduler.frame_due() and not scheduler.step_due()
+
+
+def test_slow_frames_are_skipped_not_the_steps():
+    scheduler, clock = make(0.125, 0.25)
+    scheduler.drawn()
+    clock.now = 0.875  # Drawing took long
+    scheduler.drawn()
+    assert scheduler.frames_skipped == 2  # Frames due at 0.25 and 0.5 are missed...
+    assert scheduler.next_frame == 1.0  # ...and the next stays on the frame timeline
+    steps = 0
+    while scheduler.step_due():
+        scheduler.stepped()
+        steps += 1
+    assert steps == 8  # Every step due by 0.875 is caught up on
+
+
+def test_shift_postpones_both_deadlines():
+    scheduler, clock = make(0.2, 0.1)
+    scheduler.stepped()
+    scheduler.drawn()
+    scheduler.shift(5.0)
+    clock.now = 5.05
+    assert not scheduler.step_due() and not scheduler.frame_due()
+    clock.now = 5.1
+    assert scheduler.frame_due()
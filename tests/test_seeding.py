@@ -0,0 +1,52 @@
+from environment import Environment, DummyAgent
+from agent import LearningAgent
+from simulator import Simulator
+
+
+def seeded_environment(seed):
+    env = Environment(num_dummies=5, seed=seed)
+    primary = env.create_agent(DummyAgent)
+    env.set_primary_agent(primary, enforce_deadline=True)
+    return env
+
+
+def play_trial(env, trial=None):
+    """Play one trial and return everything observable about it."""
+    env.reset(trial=trial)
+    states = env.agent_states
+    setup = (list(env.lights.initial), list(env.lights.period), list(states.location), list(states.heading), list(states.destination))
+    path = []
+    while not env.done:
+        env.step()
+        path.append((tuple(states.location), tuple(states.heading)))
+    return setup, path
+
+
+def test_trial_replays_without_earlier_trials():
+    env = seeded_environment(11)
+    trials = [play_trial(env) for _ in range(8)]
+    assert env.trial == 7
+    for k in (0, 5, 7):
+        assert play_trial(seeded_environment(11), trial=k) == trials[k]
+    assert play_trial(seeded_environment(12), trial=5) != trials[5]
+
+
+def test_seeded_runs_are_reproducible():
+    results = []
+    for _ in range(2):
+        env = Environment(seed=3)
+        agent = env.create_agent(LearningAgent)
+        env.set_primary_agent(agent, enforce_deadline=True)
+        stats = Simulator(env, update_delay=0, display=False).run(20)
+        results.append((stats['steps'], stats['successes'], agent.total_reward, agent.qs.q.tolist()))
+    assert results[0] == results[1]
+
+
+def test_run_continues_trial_numbers():
+    env = seeded_environment(5)
+    sim = Simulator(env, update_delay=0, display=False)
+    sim.run(3)
+    sim.run(2)
+    assert env.trial == 4
+    sim.run(1, first_trial=2)
+    assert env.trial == 2
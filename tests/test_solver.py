@@ -0,0 +1,52 @@
+import numpy as np
+
+from environment import Environment
+from agent import LearningAgent
+from qtable import STATE_IDS, ACTION_IDS
+from solver import reward_model, value_iteration, solve, initialize_agent, compare
+
+
+def test_reward_model_follows_act_rules():
+    R = reward_model()
+    assert R[STATE_IDS[('green', None, None, 'forward')], ACTION_IDS['forward']] == 2.0
+    assert R[STATE_IDS[('red', None, None, 'forward')], ACTION_IDS['forward']] == -1.0
+    assert R[STATE_IDS[('green', 'forward', None, 'left')], ACTION_IDS['left']] == -1.0
+    assert R[STATE_IDS[('red', None, None, 'forward')], ACTION_IDS['right']] == -0.5
+    assert (R[:, ACTION_IDS[None]] == 0).all()
+
+
+def test_value_iteration_on_a_two_state_chain():
+    # Action 0 stays put for no reward; action 1 earns 1 and moves to the other state
+    P = np.zeros((2, 2, 2))
+    P[0, 0, 0] = P[1, 0, 1] = P[0, 1, 1] = P[1, 1, 0] = 1
+    R = np.array([[0.0, 1.0], [0.0, 1.0]])
+    Q, iterations = value_iteration(P, R, gamma=0.5)
+    assert np.allclose(Q, [[1.0, 2.0], [1.0, 2.0]])
+
+
+def test_solution_drives_and_initializes_agents():
+    Q, counts = solve(n_envs=256, n_steps=50, seed=0)
+    for waypoint in ('forward', 'left', 'right'):
+        assert np.argmax(Q[STATE_IDS[('green', None, None, waypoint)]]) == ACTION_IDS[waypoint]
+    agent = Environment(seed=1).create_agent(LearningAgent)
+    initialize_agent(agent, Q)
+    result = compare(agent.qs, Q, counts)
+    assert result['greedy_agreement'] == 1.0 and result['max_abs_error'] == 0.0
+
+
+def test_transitions_across_resets_are_not_counted(monkeypatch):
+    import solver
+
+    class CountingVecEnvironment(solver.VecEnvironment):
+        ended = 0
+
+        def step(self, actions):
+            obs, rewards, done = super(CountingVecEnvironment, self).step(actions)
+            CountingVecEnvironment.ended += int(done.sum())
+            return obs, rewards, done
+
+    monkeypatch.setattr(solver, 'VecEnvironment', CountingVecEnvironment)
+    P, counts = solver.estimate_transitions(n_envs=64, n_steps=200, seed=0)
+    assert CountingVecEnvironment.ended > 0
+    # Every step is counted except those that ended a trial and jumped to a reset state
+    assert counts.sum() == 64 * 200 - CountingVecEnvironment.ended
@@ -0,0 +1,38 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET = 1.0  # Seconds to import a module in a fresh interpreter; numpy alone takes about 0.1s
+HEAVY_MODULES = ('pandas', 'pygame', 'matplotlib')
+
+
+def import_in_fresh_interpreter(module):
+    """Import a module in a new interpreter; return (seconds taken, heavy modules it pulled in)."""
+    code = "import sys, {}; print(' '.join(m for m in {!r} if m in sys.modules))".format(module, HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO, capture_output=True, text=True, check=True)
+    timings = [line for line in result.stderr.splitlines() if line.startswith('import time:') and line.rstrip().endswith(' ' + module)]
+    cumulative = int(timings[-1].split('|')[1])  # Microseconds, including everything it imported
+    return cumulative / 1e6, result.stdout.split()
+
+
+@pytest.mark.parametrize('module', ['agent', 'simulator', 'actor_learner'])
+def test_import_time_budget(module):
+    seconds, heavy = import_in_fresh_interpreter(module)
+    assert heavy == []
+    assert seconds < IMPORT_BUDGET
+
+
+def test_sprites_are_loaded_once_per_color(tmp_path, monkeypatch):
+    pygame = pytest.importorskip('pygame')
+    from simulator import load_sprite
+
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('images')
+    pygame.image.save(pygame.Surface((64, 64)), os.path.join('images', 'car-red.png'))
+    sprite = load_sprite(pygame, 'red', (32, 32))
+    assert sprite.get_size() == (32, 32)
+    assert load_sprite(pygame, 'red', (32, 32)) is sprite
+    assert load_sprite(pygame, 'red', (16, 16)) is not sprite
@@ -0,0 +1,18 @@
+from agent import alpha_schedule, inverse_alpha
+from sweep import sweep, columns
+
+
+def test_alpha_schedules():
+    assert alpha_schedule('inverse') is inverse_alpha
+    assert alpha_schedule('inverse_sqrt')(4) == 0.5
+    assert alpha_schedule(0.25)(100) == 0.25
+
+
+def test_sweep_collects_one_row_per_config():
+    rows = sweep(alphas=('inverse', 0.0), gammas=(0.5,), trials=(5,), seeds=(0, 1), jobs=1)
+    assert [(row['alpha'], row['seed']) for row in rows] == [('inverse', 0), ('inverse', 1), (0.0, 0), (0.0, 1)]
+    for row in rows:
+        assert set(row) == set(columns)
+        assert 0 <= row['successes'] <= row['trials'] == 5
+    # The same configuration and seed reproduce the same run
+    assert sweep(alphas=('inverse',), trials=(5,), seeds=(0,), jobs=1)[0]['steps'] == rows[0]['steps']
@@ -0,0 +1,56 @@
+import os
+import zlib
+import struct
+
+import pytest
+
+from environment import Environment, DummyAgent
+from simulator import Simulator
+from video import FrameEncoder
+
+pygame = pytest.importorskip('pygame')
+
+
+def read_png(path):
+    """Decode a PNG written by video.write_png to (width, height, RGB bytes)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    width, height = struct.unpack('>II', data[16:24])
+    idat = data[data.index(b'IDAT') + 4:data.index(b'IEND') - 8]
+    raw = zlib.decompress(idat)
+    stride = 1 + width * 3
+    return width, height, b''.join(raw[y * stride + 1:(y + 1) * stride] for y in range(height))
+
+
+def test_encoder_writes_png_frames(tmp_path):
+    encoder = FrameEncoder(str(tmp_path / 'clip.png'), (3, 2))
+    frame = bytes(range(24))
+    assert encoder.submit(frame)
+    encoder.close()
+    assert read_png(str(tmp_path / 'clip-00000.png')) == (3, 2, bytes(b for i, b in enumerate(frame) if i % 4 != 3))
+
+
+def test_full_queue_drops_frames(tmp_path):
+    encoder = FrameEncoder(str(tmp_path / 'clip.png'), (1, 1), max_pending=1)
+    encoder.close()  # The worker has stopped, so nothing leaves the queue
+    assert encoder.submit(b'\0' * 4)
+    assert not encoder.submit(b'\0' * 4)
+    assert (encoder.frames, encoder.dropped) == (1, 1)
+
+
+def test_headless_run_records_selected_trials(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('images')
+    sprite = pygame.Surface((8, 8))
+    for color in Simulator.colors:
+        pygame.image.save(sprite, os.path.join('images', 'car-{}.png'.format(color)))
+
+    env = Environment(seed=0)
+    env.create_agent(DummyAgent)
+    env.set_primary_agent(env.create_agent(DummyAgent))
+    sim = Simulator(env, update_delay=0, display=False, record=str(tmp_path / 'out' / 'trial-{trial}.png'), record_trials=[1], record_every=5)
+    sim.run(n_trials=2)
+    frames = sorted(os.listdir(str(tmp_path / 'out')))
+    assert frames and all(name.startswith('trial-1-') for name in frames)
+    width, height, pixels = read_png(str(tmp_path / 'out' / frames[0]))
+    assert (width, height) == sim.size
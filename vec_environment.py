@@ -0,0 +1,275 @@
+import numpy as np
+
+from environment import Environment, build_transition_table, check_grid_size
+from planner import RoutePlanner, waypoint_array
+
+# Action codes index into Environment.valid_actions: None, 'forward', 'left', 'right'
+NONE, FORWARD, LEFT, RIGHT = range(4)
+
+# Heading codes index into Environment.valid_headings (ENWS)
+HEADING_X = np.array([h[0] for h in Environment.valid_headings], dtype=np.int64)
+HEADING_Y = np.array([h[1] for h in Environment.valid_headings], dtype=np.int64)
+
+
+class VecEnvironment(object):
+    """N independent smartcab worlds stepped together as NumPy arrays.
+
+    Each world mirrors Environment: a wrap-around grid with a traffic light at every
+    intersection, some dummy traffic and one primary taxi. Agents are stored along the
+    second array axis with dummies first and the primary agent last, matching the order
+    in which Environment steps its agents. Locations are intersection indices as used by
+    build_transition_table, and actions and observations use integer codes that index
+    into Environment.valid_actions.
+    """
+
+    def __init__(self, n_envs, grid_size=(8, 6), num_dummies=3, enforce_deadline=True, seed=None):
+        """
+        Initialize a batch of environments.
+
+        Parameters:
+        n_envs (int): Number of independent worlds.
+        grid_size (tuple): Grid size as (cols, rows).
+        num_dummies (int): Number of dummy agents per world.
+        enforce_deadline (bool): Whether a world ends when the primary agent runs out of time.
+        seed (int): Seed for the batch's random number generator.
+        """
+        check_grid_size(grid_size)
+        self.n_envs = n_envs
+        self.grid_size = grid_size
+        self.num_dummies = num_dummies
+        self.enforce_deadline = enforce_deadline
+        self.rng = np.random.default_rng(seed)
+
+        n = n_envs
+        cols, rows = grid_size
+        self.n_agents = num_dummies + 1
+        self.primary = num_dummies  # Index of the primary agent along the agent axis
+        self._rows = np.arange(n)
+        self.next_location, self.next_heading = build_transition_table(grid_size)
+        self.waypoints = waypoint_array(grid_size) if cols * rows <= RoutePlanner.max_table_intersections else None
+
+        # Traffic lights (True = NS open, False = EW open), evaluated in closed form like TrafficLights
+        self.light_initial = self.rng.random((n, cols * rows)) < 0.5
+        self.light_period = self.rng.integers(3, 6, size=(n, cols * rows))
+        self.light_t = np.zeros(n, dtype=np.int64)  # Time step each world's lights are evaluated at
+
+        # Agents: intersection indices, heading codes and next waypoint codes
+        self.location = np.zeros((n, self.n_agents), dtype=np.int64)
+        self.heading = np.zeros((n, self.n_agents), dtype=np.int64)
+        self.waypoint = np.zeros((n, self.n_agents), dtype=np.int64)
+        self.waypoint[:, :num_dummies] = self.rng.integers(FORWARD, RIGHT + 1, size=(n, num_dummies))
+
+        # Primary agent trip
+        self.destination = np.zeros(n, dtype=np.int64)
+        self.deadline = np.zeros(n, dtype=np.int64)
+        self.t = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+
+    def reset(self, mask=None):
+        """
+        Reset some or all worlds for a new trial.
+
+        Parameters:
+        mask (ndarray): Boolean mask of worlds to reset; all worlds if None.
+
+        Returns:
+        dict: Observation arrays of the primary agents (see sense).
+        """
+        mask = np.ones(self.n_envs, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        self._reset_worlds(mask)
+        self._begin_tick(mask)  # Worlds that are not reset keep their current tick
+        return self.sense()
+
+    def step(self, actions):
+        """
+        Apply the primary agents' actions and advance every world by one time step.
+
+        Worlds that finish are reset immediately, so the returned observation is always
+        the start of a live trial.
+
+        Parameters:
+        actions (ndarray): Action codes of the primary agents, one per world.
+
+        Returns:
+        tuple: (observation dict, rewards, done) where done flags worlds whose trial ended.
+        """
+        rewards = self.act(actions)
+
+        self.t += 1
+        self.done |= self.deadline <= Environment.hard_time_limit
+        if self.enforce_deadline:
+            self.done |= self.deadline <= 0
+        self.deadline -= 1
+
+        done = self.done.copy()
+        if done.any():
+            self._reset_worlds(done)
+        self._begin_tick()
+        return self.sense(), rewards, done
+
+    def sense(self, agent=None):
+        """
+        Sense the state of every world for one agent.
+
+        Parameters:
+        agent (int): Agent index along the agent axis; the primary agent if None.
+
+        Returns:
+        dict: Arrays 'light' (True when green), 'oncoming', 'left', 'right' and 'waypoint'.
+        """
+        i = self.primary if agent is None else agent
+        rows = self._rows
+        location = self.location[:, i]
+        heading = self.heading[:, i]
+        ns_open = self.light_initial[rows, location] != (self.light_t // self.light_period[rows, location]) % 2
+        green = ns_open == (heading % 2 == 1)
+
+        # Other agents at the same intersection, classified by their heading relative to ours
+        present = (self.location == location[:, None]) & (self.heading != heading[:, None])
+        present[:, i] = False
+        relative = (self.heading - heading[:, None]) % 4
+        waypoint = self.waypoint
+
+        # Resolve several cars in one direction the same way Environment.sense does
+        oncoming = present & (relative == 2)
+        oncoming = np.where((oncoming & (waypoint == LEFT)).any(axis=1), LEFT, self._last(oncoming, waypoint))
+        right = present & (relative == 1)
+        right_turning = right & ((waypoint == FORWARD) | (waypoint == LEFT))
+        right = np.where(right_turning.any(axis=1), self._first(right_turning, waypoint), self._last(right, waypoint))
+        left = present & (relative == 3)
+        left = np.where((left & (waypoint == FORWARD)).any(axis=1), FORWARD, self._last(left, waypoint))
+
+        return {'light': green, 'oncoming': oncoming, 'left': left, 'right': right, 'waypoint': waypoint[:, i].copy()}
+
+    def act(self, actions):
+        """
+        Perform the primary agents' actions, using the reward rules of Environment.act.
+
+        Parameters:
+        actions (ndarray): Action codes of the primary agents, one per world.
+
+        Returns:
+        ndarray: The reward for each world.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        i = self.primary
+        inputs = self.sense()
+        green = inputs['light']
+
+        move_okay = np.ones(self.n_envs, dtype=bool)
+        move_okay[actions == FORWARD] = green[actions == FORWARD]
+        left_okay = green & ((inputs['oncoming'] == NONE) | (inputs['oncoming'] == LEFT))
+        move_okay[actions == LEFT] = left_okay[actions == LEFT]
+
+        rewards = np.where(actions == inputs['waypoint'], 2.0, -0.5)
+        rewards[actions == NONE] = 0.0
+        rewards[~move_okay] = -1.0
+
+        moving = move_okay & (actions != NONE)
+        self._move(i, moving, actions)
+
+        arrived = self.location[:, i] == self.destination
+        rewards[arrived & (self.deadline >= 0)] += 10
+        self.done |= arrived
+        return rewards
+
+    def light_states(self):
+        """
+        Evaluate every traffic light of every world at its current time step.
+
+        Returns:
+        ndarray: Boolean (n_envs, cols * rows) array, True where NS is open.
+        """
+        return self.light_initial != (self.light_t[:, None] // self.light_period) % 2
+
+    def _reset_worlds(self, mask):
+        """Set up a new trial in the masked worlds."""
+        n = int(mask.sum())
+        if n == 0:
+            return
+        cols, rows = self.grid_size
+        rng = self.rng
+
+        self.done[mask] = False
+        self.t[mask] = 0
+
+        # Lights keep their current state into the new trial
+        self.light_initial[mask] = self.light_states()[mask]
+        self.light_t[mask] = 0
+
+        # Pick a start and a destination that are not too close
+        start_x = rng.integers(0, cols, size=n)
+        start_y = rng.integers(0, rows, size=n)
+        dest_x = rng.integers(0, cols, size=n)
+        dest_y = rng.integers(0, rows, size=n)
+        close = np.abs(dest_x - start_x) + np.abs(dest_y - start_y) < Environment.min_trip_distance
+        while close.any():
+            k = int(close.sum())
+            start_x[close] = rng.integers(0, cols, size=k)
+            start_y[close] = rng.integers(0, rows, size=k)
+            dest_x[close] = rng.integers(0, cols, size=k)
+            dest_y[close] = rng.integers(0, rows, size=k)
+            close = np.abs(dest_x - start_x) + np.abs(dest_y - start_y) < Environment.min_trip_distance
+
+        self.destination[mask] = dest_x * rows + dest_y
+        self.deadline[mask] = (np.abs(dest_x - start_x) + np.abs(dest_y - start_y)) * 5
+
+        location = rng.integers(0, cols * rows, size=(n, self.n_agents))
+        location[:, self.primary] = start_x * rows + start_y
+        self.location[mask] = location
+        self.heading[mask] = rng.integers(0, 4, size=(n, self.n_agents))
+
+    def _begin_tick(self, mask=None):
+        """Advance traffic lights and update dummy agents, then route the primary agents (in the masked worlds only, if a mask is given)."""
+        if mask is None:
+            self.light_t[:] = self.t
+        else:
+            self.light_t[mask] = self.t[mask]
+
+        for d in range(self.num_dummies):
+            inputs = self.sense(d)
+            green = inputs['light']
+            waypoint = self.waypoint[:, d]
+            action_okay = np.where(waypoint == RIGHT, green | (inputs['left'] != FORWARD),
+                                   np.where(waypoint == FORWARD, green,
+                                            green & (inputs['oncoming'] != FORWARD) & (inputs['oncoming'] != RIGHT)))
+            if mask is not None:
+                action_okay &= mask
+            self._move(d, action_okay, waypoint)
+            self.waypoint[action_okay, d] = self.rng.integers(FORWARD, RIGHT + 1, size=int(action_okay.sum()))
+
+        if mask is None:
+            self.waypoint[:, self.primary] = self._route()
+        else:
+            self.waypoint[mask, self.primary] = self._route()[mask]
+
+    def _move(self, i, mask, actions):
+        """Turn and advance agent i in the masked worlds, using the transition table."""
+        location = self.location[mask, i]
+        heading = self.heading[mask, i]
+        action = actions[mask]
+        self.location[mask, i] = self.next_location[location, heading, action]
+        self.heading[mask, i] = self.next_heading[location, heading, action]
+
+    def _route(self):
+        """Compute the primary agents' next waypoints the way RoutePlanner.next_waypoint does."""
+        i = self.primary
+        if self.waypoints is not None:
+            return self.waypoints[self.location[:, i], self.heading[:, i], self.destination]
+        rows = self.grid_size[1]
+        dx = self.destination // rows - self.location[:, i] // rows
+        dy = self.destination % rows - self.location[:, i] % rows
+        hx = HEADING_X[self.heading[:, i]]
+        hy = HEADING_Y[self.heading[:, i]]
+        east_west = np.select([dx * hx > 0, dx * hx < 0, dx * hy > 0], [FORWARD, RIGHT, LEFT], RIGHT)
+        north_south = np.select([dy * hy > 0, dy * hy < 0, dy * hx > 0], [FORWARD, RIGHT, RIGHT], LEFT)
+        return np.where(dx != 0, east_west, np.where(dy != 0, north_south, NONE))
+
+    def _first(self, mask, values):
+        """Value at the first True position of each row of mask (rows must have one)."""
+        return values[self._rows, np.argmax(mask, axis=1)]
+
+    def _last(self, mask, values):
+        """Value at the last True position of each row of mask, or NONE for empty rows."""
+        last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+        return np.where(mask.any(axis=1), values[self._rows, last], NONE)
@@ -0,0 +1,149 @@
+import os
+import sys
+import zlib
+import queue
+import shutil
+import struct
+import threading
+import subprocess
+
+import numpy as np
+
+from events import log
+
+IMAGE_EXTENSIONS = ('.png',)
+STOP = None  # Queue entry that tells the worker to finish
+
+
+def write_png(path, frame, width, height):
+    """
+    Write an RGBX frame as an RGB PNG file.
+
+    Parameters:
+    path (str): File to write.
+    frame (bytes): width * height * 4 bytes, one RGBX pixel after another.
+    width (int): Frame width in pixels.
+    height (int): Frame height in pixels.
+    """
+    pixels = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 4)[:, :, :3]
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)  # Each row starts with filter type 0 (none)
+    rows[:, 1:] = pixels.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 1)))  # zlib releases the GIL while compressing
+        f.write(chunk(b'IEND', b''))
+
+
+class FrameEncoder(object):
+    """Encodes frames to a video or a PNG sequence in a separate process.
+
+    submit() only puts the frame on a bounded queue, so the simulation never waits for the
+    encoder: if the queue is full the frame is dropped and counted. A background thread
+    feeds queued frames through a pipe to an encoder process, so compression never competes
+    with the simulation for the interpreter lock. Videos are encoded by ffmpeg; a path ending
+    in .png, or any path when ffmpeg is not installed, is written as numbered PNG files by
+    this module run as a script.
+    """
+
+    def __init__(self, path, size, fps=10, max_pending=32):
+        """
+        Start a FrameEncoder.
+
+        Parameters:
+        path (str): Output file, e.g. 'trial.mp4'; PNG frames are written next to it as '<name>-00000.png'.
+        size (tuple): Frame size as (width, height).
+        fps (float): Frame rate of the video.
+        max_pending (int): Frames queued for the encoder before new ones are dropped.
+        """
+        self.path = path
+        self.width, self.height = size
+        self.fps = fps
+        self.frames = 0  # Frames submitted and queued
+        self.dropped = 0  # Frames dropped because the encoder fell behind
+        self.max_pending = max_pending
+        self.queue = queue.Queue()  # Bounded by submit, so that finish never blocks
+
+        base, ext = os.path.splitext(path)
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        ffmpeg = shutil.which('ffmpeg') if ext.lower() not in IMAGE_EXTENSIONS else None
+        if ffmpeg is None:
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                log.warning('FrameEncoder', "FrameEncoder(): ffmpeg not found; writing {} as PNG frames", path)
+            command = [sys.executable, os.path.abspath(__file__), base + '-{:05d}.png', str(self.width), str(self.height)]
+        else:
+            command = [ffmpeg, '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb0', '-s', '{}x{}'.format(self.width, self.height),
+                       '-r', str(fps), '-i', '-', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', path]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.thread = threading.Thread(target=self.work, name='FrameEncoder', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame):
+        """
+        Queue a frame for encoding, or drop it if the encoder is too far behind.
+
+        Parameters:
+        frame (bytes): width * height * 4 bytes of RGBX pixels, e.g. pygame.image.tobytes(surface, 'RGBX').
+
+        Returns:
+        bool: Whether the frame was queued.
+        """
+        if self.queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return False
+        self.queue.put(frame)
+        self.frames += 1
+        return True
+
+    def work(self):
+        """Send queued frames to the encoder process until told to stop."""
+        while True:
+            frame = self.queue.get()
+            if frame is STOP:
+                break
+            try:
+                self.process.stdin.write(frame)
+            except (OSError, ValueError) as e:
+                log.warning('FrameEncoder', "FrameEncoder(): stopped writing {}: {}: {}", self.path, e.__class__.__name__, e)
+                break
+        # Drain what was left after an error, so a blocked close() can finish
+        while frame is not STOP:
+            frame = self.queue.get()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+    def finish(self):
+        """Tell the encoder no more frames are coming, without waiting for it (see close)."""
+        self.queue.put(STOP)
+
+    def close(self):
+        """Finish encoding every queued frame and wait for the output to be written."""
+        if self.thread.is_alive():
+            self.finish()
+            self.thread.join()
+
+
+def main(argv):
+    """Write raw RGBX frames read from stdin as numbered PNG files: video.py PATTERN WIDTH HEIGHT."""
+    pattern, width, height = argv[0], int(argv[1]), int(argv[2])
+    size = width * height * 4
+    written = 0
+    while True:
+        frame = sys.stdin.buffer.read(size)
+        if len(frame) < size:
+            break
+        write_png(pattern.format(written), frame, width, height)
+        written += 1
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])